@@ -1,192 +1,69 @@
 import streamlit as st
 from datetime import datetime, timedelta
-import urllib.parse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import os
 import time
-import math
-import pandas as pd
-import random
-import json
-import base64
-import re
-
-# --- 嘗試匯入進階套件 ---
-try:
-    import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
-    CLOUD_AVAILABLE = True
-except ImportError:
-    CLOUD_AVAILABLE = False
-
-# --- Google Gemini 套件 ---
-try:
-    import google.generativeai as genai
-    from PIL import Image
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+
+from trip_app import ai, forecast, importers, matching, metrics, phrases, search, sync
+from trip_app.deps import CLOUD_AVAILABLE, TTS_AVAILABLE, get_pandas
+from trip_app.ledger import add_expense, add_expenses, now_ts
+from trip_app.links import generate_google_nav_link, generate_google_search_link
+from trip_app.model import (
+    DEFAULT_RATES, DEFAULT_THEME, SHOPPING_COLUMNS, THEMES,
+    Hotel, Wish, build_timeline, default_checklist, default_flight_info, default_hotel_info,
+    default_trip_data, default_wishlist, ensure_days, find_item, is_valid_checklist, new_item,
+)
+from trip_app.prefetch import AdvicePrefetcher
 
 # -------------------------------------
-# 1. 系統設定 & 主題定義
+# 1. 系統設定
 # -------------------------------------
 st.set_page_config(page_title="2026 旅程規劃 Pro", page_icon="✈️", layout="centered", initial_sidebar_state="collapsed")
 
-# 🎨 主題配色庫
-THEMES = {
-    "⛩️ 京都緋紅 (預設)": {
-        "bg": "#FDFCF5", "card": "#FFFFFF", "text": "#2B2B2B", "primary": "#8E2F2F", "secondary": "#D6A6A6", "sub": "#666666"
-    },
-    "🌫️ 莫蘭迪·霧藍": {
-        "bg": "#F0F4F8", "card": "#FFFFFF", "text": "#243B53", "primary": "#486581", "secondary": "#BCCCDC", "sub": "#627D98"
-    },
-    "🌿 莫蘭迪·鼠尾草": {
-        "bg": "#F1F5F1", "card": "#FFFFFF", "text": "#2C3E2C", "primary": "#5F7161", "secondary": "#AFC0B0", "sub": "#506050"
-    },
-    "🍂 莫蘭迪·焦糖奶茶": {
-        "bg": "#FAF6F1", "card": "#FFFFFF", "text": "#4A3B32", "primary": "#9C7C64", "secondary": "#E0D0C5", "sub": "#7D6556"
-    }
-}
-
-DEFAULT_RATES = {
-    "日本": 0.2150, "韓國": 0.0235, "泰國": 0.9500, "台灣": 1.0000
-}
+# 效能量測：TRIP_METRICS_PORT 開啟 /metrics 輸出；TRIP_DEBUG=1 顯示效能面板 (只看伺服器設定，訪客無法從網址打開)
+rerun_t0 = time.perf_counter()
+rerun_spans = metrics.start_trace()
+if os.environ.get("TRIP_METRICS_PORT"): metrics.start_http_server(int(os.environ["TRIP_METRICS_PORT"]))
+DEBUG_MODE = os.environ.get("TRIP_DEBUG") == "1"
 
 # -------------------------------------
-# 2. 核心功能函數
+# 2. Streamlit 包裝 (核心邏輯在 trip_app)
 # -------------------------------------
-
-def get_gemini_model():
-    if not GEMINI_AVAILABLE: return None
-    if "GEMINI_API_KEY" not in st.secrets: return None
-    try:
-        genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-        priority_models = [
-            'gemini-2.0-flash', 'gemini-2.5-flash', 'gemini-2.5-pro',
-            'gemini-2.0-flash-lite', 'gemini-1.5-flash', 'gemini-pro'
-        ]
-        return genai.GenerativeModel(priority_models[0])
-    except Exception as e:
-        print(f"Model Init Error: {e}")
-        return None
-
-def get_ai_step_advice_stream(item, country):
-    model = get_gemini_model()
-    if not model:
-        yield "⚠️ AI 未啟用 (請設定 API Key)"
-        return
+def get_secret(key):
     try:
-        prompt = f"""
-        使用者正在 {country} 旅遊。
-        當下行程：{item['title']} (地點: {item['loc']})
-        備註：{item['note']}
-        請提供約 100 字的簡短建議(注意事項、看點或美食)。
-        """
-        response = model.generate_content(prompt, stream=True)
-        for chunk in response:
-            if chunk.text: yield chunk.text
-    except Exception as e:
-        err_msg = str(e)
-        if "404" in err_msg: yield "⚠️ 錯誤 404：找不到模型。"
-        else: yield f"連線錯誤: {err_msg}"
-
-def parse_wishlist_text(raw_text):
-    model = get_gemini_model()
-    if not model: return None
-    try:
-        prompt = f"""
-        請分析以下文字（可能是 Google Maps 分享連結、Tabelog 店名、或一段網誌介紹），提取出旅遊景點資訊。
-        文字內容：{raw_text}
-        
-        請回傳一個 JSON 物件 (Object)，包含以下欄位：
-        - title: 景點或餐廳名稱
-        - loc: 地址或大概區域 (如果沒有，留空)
-        - note: 簡短的描述或評價 (從文字中摘要)
-        
-        只回傳 JSON，不要有 Markdown。
-        """
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        text = text.replace("```json", "").replace("```", "").strip()
-        return json.loads(text)
-    except Exception as e:
-        print(f"Wishlist Parse Error: {e}")
+        return st.secrets.get(key)
+    except Exception:
         return None
 
-def analyze_receipt_image(image_file):
-    model = get_gemini_model()
-    default_res = [{"name": "分析失敗", "price": 0}]
-    if not model: return [{"name": "模擬商品(無AI)", "price": 100}]
+def process_excel_upload(uploaded_file):
     try:
-        img = Image.open(image_file)
-        prompt = "你是一個收據辨識助手。請分析這張圖片，列出商品名稱與金額(整數)。請排除小計、稅金、合計。請務必直接回傳一個 JSON Array，不要包含 ```json 或其他文字。格式範例：[{'name':'商品A', 'price':100}, {'name':'商品B', 'price':500}]"
-        response = model.generate_content([prompt, img])
-        text = response.text.strip()
-        match = re.search(r'\[.*\]', text, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-            data = json.loads(json_str)
-            return data if isinstance(data, list) else default_res
-        else:
-            text = text.replace("```json", "").replace("```", "").strip()
-            data = json.loads(text)
-            return data if isinstance(data, list) else default_res
+        new_trip_data = importers.parse_excel(uploaded_file)
+        st.session_state.trip_data = new_trip_data
+        st.session_state.trip_days_count = max(new_trip_data.keys())
     except Exception as e:
-        print(f"OCR Error: {e}")
-        return default_res
+        st.error(f"匯入失敗：{e}")
+        return
+    st.rerun()
 
-def get_cloud_connection():
-    if not CLOUD_AVAILABLE: return None
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    try:
-        if "gcp_service_account" in st.secrets:
-            creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], scope)
-        else:
-            creds = ServiceAccountCredentials.from_json_keyfile_name('secrets.json', scope)
-        client = gspread.authorize(creds)
-        return client
-    except: return None
-
-def save_to_cloud(json_str):
-    client = get_cloud_connection()
-    if client:
+def local_now():
+    """使用者瀏覽器所在時區的現在時間 (伺服器常跑在 UTC)；拿不到時區時退回伺服器時間。"""
+    tz = st.context.timezone
+    if tz:
         try:
-            sheet = client.open("TripPlanDB").sheet1 
-            sheet.update_cell(1, 1, json_str)
-            return True, "儲存成功！"
-        except Exception as e: return False, f"寫入失敗: {e}"
-    return False, "連線失敗 (請檢查 secrets 設定)"
-
-def load_from_cloud():
-    client = get_cloud_connection()
-    if client:
-        try:
-            sheet = client.open("TripPlanDB").sheet1
-            return sheet.cell(1, 1).value
-        except: return None
-    return None
+            return datetime.now(ZoneInfo(tz)).replace(tzinfo=None)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return datetime.now()
 
-def generate_google_nav_link(origin, dest, mode="transit"):
-    if not origin or not dest: return "#"
-    base = "https://www.google.com/maps/dir/?api=1"
-    return f"{base}&origin={urllib.parse.quote(origin)}&destination={urllib.parse.quote(dest)}&travelmode={mode}"
+def record_receipt(item, day_num, lines, fp):
+    cnt = add_expenses(item, lines, receipt=fp, ts=now_ts(local_now()))
+    for ex in item.expenses[-cnt:]:
+        st.session_state.expense_index.add(ex, day_num, item.id)
+    return cnt
 
-def process_excel_upload(uploaded_file):
-    try:
-        df = pd.read_excel(uploaded_file)
-        new_trip_data = {}
-        for _, row in df.iterrows():
-            day = int(row['Day'])
-            if day not in new_trip_data: new_trip_data[day] = []
-            new_trip_data[day].append({
-                "id": int(time.time()*1000)+random.randint(0,1000), 
-                "time": str(row['Time']), "title": str(row['Title']),
-                "loc": str(row.get('Location','')), "cost": int(row.get('Cost',0)), 
-                "note": str(row.get('Note','')), "expenses": []
-            })
-        st.session_state.trip_data = new_trip_data
-        st.session_state.trip_days_count = max(new_trip_data.keys())
-        st.rerun()
-    except Exception as e: 
-        st.error(f"匯入失敗：{e}")
+def record_line(item, day_num, name, price):
+    ex = add_expense(item, name, price, ts=now_ts(local_now()))
+    st.session_state.expense_index.add(ex, day_num, item.id)
 
 # -------------------------------------
 # 3. 初始化 & 資料
@@ -195,80 +72,35 @@ if "trip_title" not in st.session_state: st.session_state.trip_title = "2026 阪
 if "exchange_rate" not in st.session_state: st.session_state.exchange_rate = 0.215
 if "trip_days_count" not in st.session_state: st.session_state.trip_days_count = 5
 if "target_country" not in st.session_state: st.session_state.target_country = "日本"
-if "selected_theme_name" not in st.session_state: st.session_state.selected_theme_name = "⛩️ 京都緋紅 (預設)"
+if "selected_theme_name" not in st.session_state: st.session_state.selected_theme_name = DEFAULT_THEME
 if "start_date" not in st.session_state: st.session_state.start_date = datetime(2026, 1, 17)
 
 if "wishlist" not in st.session_state:
-    st.session_state.wishlist = [
-        {"id": 901, "title": "HARBS 千層蛋糕", "loc": "大丸京都店", "note": "必吃水果千層"},
-        {"id": 902, "title": " % Arabica 咖啡", "loc": "嵐山", "note": "網美打卡點"}
-    ]
+    st.session_state.wishlist = default_wishlist()
+# 購物清單存成 list of dict；只有展開編輯器時才轉成 DataFrame (pandas 要到那時才載入)
 if "shopping_list" not in st.session_state:
-    st.session_state.shopping_list = pd.DataFrame(columns=["對象", "商品名稱", "預算(¥)", "已購買"])
+    st.session_state.shopping_list = []
 
 if "current_step_index" not in st.session_state:
     st.session_state.current_step_index = 0
 if "ai_advice_cache" not in st.session_state:
     st.session_state.ai_advice_cache = {} 
+if "advice_prefetcher" not in st.session_state:
+    st.session_state.advice_prefetcher = AdvicePrefetcher(get_secret("GEMINI_API_KEY"), st.session_state.target_country)
 
-default_checklist = {
-    "必要證件": {"護照": False, "機票證明": False, "Visit Japan Web": False, "日幣現金": False},
-    "電子產品": {"手機 & 充電線": False, "行動電源": False, "SIM卡 / Wifi機": False, "轉接頭": False},
-    "衣物穿搭": {"換洗衣物": False, "睡衣": False, "好走的鞋子": False, "外套": False},
-    "生活用品": {"牙刷牙膏": False, "常備藥": False, "塑膠袋": False, "折疊傘": False}
-}
-if "checklist" not in st.session_state or not isinstance(st.session_state.checklist, dict):
-    st.session_state.checklist = default_checklist
-elif not all(isinstance(v, dict) for v in st.session_state.checklist.values()):
-    st.session_state.checklist = default_checklist
+if "checklist" not in st.session_state or not is_valid_checklist(st.session_state.checklist):
+    st.session_state.checklist = default_checklist()
 
 current_theme = THEMES[st.session_state.selected_theme_name]
 
 if "trip_data" not in st.session_state:
-    st.session_state.trip_data = {
-        1: [
-            {"id": 101, "time": "10:00", "title": "抵達關西機場", "loc": "關西機場", "cost": 0, "cat": "trans", "note": "入境審查", "expenses": [], "trans_mode": "🚆 Skyliner", "trans_min": 45},
-            {"id": 102, "time": "13:00", "title": "京都車站 Check-in", "loc": "KOKO HOTEL 京都", "cost": 0, "cat": "stay", "note": "寄放行李", "expenses": [], "trans_mode": "🚌 巴士", "trans_min": 20},
-            {"id": 103, "time": "15:00", "title": "錦市場", "loc": "錦市場", "cost": 2000, "cat": "food", "note": "吃午餐", "expenses": [], "trans_mode": "🚶 步行", "trans_min": 15},
-            {"id": 104, "time": "18:00", "title": "鴨川散步", "loc": "鴨川", "cost": 0, "cat": "spot", "note": "夜景", "expenses": [], "trans_mode": "📍 移動", "trans_min": 30}
-        ],
-        2: [
-            {"id": 201, "time": "09:00", "title": "清水寺", "loc": "清水寺", "cost": 400, "cat": "spot", "note": "清水舞台", "expenses": [], "trans_mode": "🚶 步行", "trans_min": 20},
-            {"id": 202, "time": "11:00", "title": "三年坂", "loc": "三年坂", "cost": 1000, "cat": "spot", "note": "買伴手禮", "expenses": [], "trans_mode": "🚶 步行", "trans_min": 15},
-            {"id": 203, "time": "13:00", "title": "八坂神社", "loc": "八坂神社", "cost": 0, "cat": "spot", "note": "祈福", "expenses": [], "trans_mode": "🚌 巴士", "trans_min": 30}
-        ],
-        3: [], 4: [], 5: []
-    }
+    st.session_state.trip_data = default_trip_data()
 
 if "flight_info" not in st.session_state:
-    st.session_state.flight_info = {
-        "outbound": {"date": "1/17", "code": "JX821", "dep": "10:00", "arr": "13:30", "dep_loc": "桃機 T1", "arr_loc": "關西機場"},
-        "inbound": {"date": "1/22", "code": "JX822", "dep": "15:00", "arr": "17:10", "dep_loc": "關西機場", "arr_loc": "桃機 T1"}
-    }
+    st.session_state.flight_info = default_flight_info()
 
 if "hotel_info" not in st.session_state:
-    st.session_state.hotel_info = [
-        {"id": 1, "name": "KOKO HOTEL 京都", "range": "D1-D3 (3泊)", "date": "1/17 - 1/19", "addr": "京都府京都市...", "link": ""},
-        {"id": 2, "name": "相鐵 FRESA INN 大阪", "range": "D4-D5 (2泊)", "date": "1/20 - 1/21", "addr": "大阪府大阪市...", "link": ""}
-    ]
-
-SURVIVAL_PHRASES = {
-    "日本": {
-        "👋 招呼": [("你好", "こんにちは"), ("謝謝", "ありがとう"), ("不好意思", "すみません"), ("是 / 不是", "はい / いいえ")],
-        "🍜 點餐": [("請給我這個", "これをください"), ("多少錢", "いくらですか"), ("結帳", "お会計お願いします"), ("好吃的", "おいしい")],
-        "🚆 交通": [("...在哪裡？", "…はどこですか？"), ("車站", "駅"), ("廁所", "トイレ"), ("請帶我去", "連れて行って")]
-    },
-    "韓國": {
-        "👋 招呼": [("你好", "안녕하세요"), ("謝謝", "감사합니다"), ("對不起", "미안합니다")],
-        "🍜 點餐": [("請給我這個", "이거 주세요"), ("多少錢", "얼마예요?"), ("買單", "계산해 주세요")],
-        "🚆 交通": [("...在哪裡？", "... 어디에요?"), ("洗手間", "화장실"), ("地鐵站", "지하철역")]
-    },
-    "泰國": {
-        "👋 招呼": [("你好", "Sawasdee"), ("謝謝", "Khop khun"), ("對不起", "Kor tod")],
-        "🍜 點餐": [("我要這個", "Ao an nee"), ("多少錢", "Tao rai?"), ("買單", "Check bin")],
-        "🚆 交通": [("去...", "Bai ..."), ("廁所", "Hong nam"), ("這裡", "Tee nee")]
-    }
-}
+    st.session_state.hotel_info = default_hotel_info()
 
 # -------------------------------------
 # 4. CSS 樣式 (美化版)
@@ -444,20 +276,19 @@ with st.expander("⚙️ 設定"):
     st.session_state.start_date = c1.date_input("日期", value=st.session_state.start_date)
     st.session_state.trip_days_count = c2.number_input("天數", 1, 30, st.session_state.trip_days_count)
     
+    # 有預設匯率的地區 + 會話包認得語言的國家；其他國家可以自己輸入 (會話包由 AI 產生，匯率手動填)
     prev_country = st.session_state.target_country
-    country_options = list(DEFAULT_RATES.keys())
-    try:
-        idx = country_options.index(prev_country)
-    except ValueError:
-        idx = 0
-    new_country = st.selectbox("地區", country_options, index=idx)
+    country_options = list(dict.fromkeys([*DEFAULT_RATES, *phrases.COUNTRY_LANGS, prev_country]))
+    other_country = "✏️ 其他…"
+    choice = st.selectbox("地區", country_options + [other_country], index=country_options.index(prev_country))
+    new_country = st.text_input("國家名稱", key="custom_country").strip() if choice == other_country else choice
     
-    if new_country != prev_country:
+    if new_country and new_country != prev_country:
         st.session_state.target_country = new_country
-        st.session_state.exchange_rate = DEFAULT_RATES[new_country]
+        st.session_state.exchange_rate = DEFAULT_RATES.get(new_country, st.session_state.exchange_rate)
         st.rerun()
-    else:
-        st.session_state.target_country = new_country
+    new_country = st.session_state.target_country
+    if new_country not in DEFAULT_RATES: st.caption(f"「{new_country}」沒有預設匯率，請在下方填入")
 
     st.session_state.exchange_rate = st.number_input(
         f"匯率 (1 {new_country}幣 換算 TWD)", 
@@ -470,8 +301,33 @@ with st.expander("⚙️ 設定"):
     if uf and st.button("匯入"): process_excel_upload(uf)
 
 # Init Days
-for d in range(1, st.session_state.trip_days_count + 1):
-    if d not in st.session_state.trip_data: st.session_state.trip_data[d] = []
+ensure_days(st.session_state.trip_data, st.session_state.trip_days_count)
+
+# 花費索引：trip_data 被整份換掉 (匯入 / 下載) 時才會重建
+if "expense_index" not in st.session_state:
+    st.session_state.expense_index = matching.ExpenseIndex()
+st.session_state.expense_index.ensure(st.session_state.trip_data)
+# 預算彙總：每次 rerun 只補上新增的花費
+if "budget_ledger" not in st.session_state:
+    st.session_state.budget_ledger = forecast.BudgetLedger()
+st.session_state.budget_ledger.sync(st.session_state.trip_data)
+
+# 🔍 全域搜尋 (有輸入才同步索引；只有內容變動的項目會重新切詞)
+if "search_index" not in st.session_state:
+    st.session_state.search_index = search.SearchIndex()
+search_q = st.text_input("🔍 搜尋", placeholder="搜尋行程、願望、清單、住宿、購物…", label_visibility="collapsed", key="global_search")
+if search_q:
+    with metrics.span("search"):
+        search.sync_all(st.session_state.search_index, st.session_state.trip_data, st.session_state.wishlist,
+                        st.session_state.checklist, st.session_state.hotel_info,
+                        st.session_state.shopping_list)
+        hits = st.session_state.search_index.query(search_q)
+    if not hits:
+        st.caption("找不到符合的項目")
+    for score, (kind, _), _, meta in hits:
+        where = f"Day {meta['day']} · " if 'day' in meta else ""
+        sub = f" — {meta['sub']}" if meta.get('sub') else ""
+        st.markdown(f"""<div class="apple-card"><span style="color:{c_sub}; font-size:0.8rem;">{search.KINDS[kind]} {where}</span><span class="apple-title">{meta['title']}</span><span style="color:{c_sub}; font-size:0.85rem;">{sub}</span></div>""", unsafe_allow_html=True)
 
 # Tabs
 tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🚀 進行中", "📅 行程", "✨ 願望", "🎒 清單", "ℹ️ 資訊", "🧰 工具"])
@@ -479,14 +335,11 @@ tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🚀 進行中", "📅 行程", "
 # ==========================================
 # 1. 🚀 進行中
 # ==========================================
-with tab1:
-    all_steps = []
-    for d in sorted(st.session_state.trip_data.keys()):
-        day_items = sorted(st.session_state.trip_data[d], key=lambda x: x['time'])
-        for item in day_items:
-            info = item.copy()
-            info['day_num'] = d
-            all_steps.append(info)
+with tab1, metrics.span("tab_render", tab="live"):
+    all_steps = build_timeline(st.session_state.trip_data)
+    prefetcher = st.session_state.advice_prefetcher
+    prefetcher.sync(st.session_state.trip_data, st.session_state.target_country)
+    prefetcher.collect(st.session_state.ai_advice_cache)
     
     if st.session_state.current_step_index >= len(all_steps):
         st.balloons()
@@ -494,78 +347,132 @@ with tab1:
         if st.button("🔄 重置進度"):
             st.session_state.current_step_index = 0
             st.session_state.ai_advice_cache = {}
+            prefetcher.cancel_all()
             st.rerun()
     elif not all_steps:
         st.info("📭 請先到「📅 行程」分頁新增行程。")
     else:
-        curr = all_steps[st.session_state.current_step_index]
-        real_item = None
-        for item in st.session_state.trip_data[curr['day_num']]:
-            if item['id'] == curr['id']:
-                real_item = item
-                break
+        day_num, curr = all_steps[st.session_state.current_step_index]
         
         prog = (st.session_state.current_step_index) / len(all_steps)
         st.progress(prog, text=f"旅程進度 {int(prog*100)}%")
         
-        real_date = st.session_state.start_date + timedelta(days=curr['day_num'] - 1)
+        real_date = st.session_state.start_date + timedelta(days=day_num - 1)
         date_str = real_date.strftime("%m/%d")
         
         st.markdown(f"""
         <div class="live-card">
-            <div style="color:{c_primary}; font-weight:bold;">🔥 NOW - Day {curr['day_num']} ({date_str})</div>
-            <div class="live-time">{curr['time']}</div>
-            <div class="live-title">{curr['title']}</div>
-            <div class="live-meta">📍 {curr['loc'] or '未設定'}</div>
+            <div style="color:{c_primary}; font-weight:bold;">🔥 NOW - Day {day_num} ({date_str})</div>
+            <div class="live-time">{curr.time}</div>
+            <div class="live-title">{curr.title}</div>
+            <div class="live-meta">📍 {curr.loc or '未設定'}</div>
             <div class="live-meta" style="margin-top:10px; background:rgba(255,255,255,0.5); padding:10px; border-radius:8px;">
-                📝 {curr['note'] or '無備註'}
+                📝 {curr.note or '無備註'}
             </div>
         </div>
         """, unsafe_allow_html=True)
+
+        # AI 建議：通常已由前一站的預載放進快取，可以立刻顯示
+        advice_key = ai.advice_cache_key(curr, st.session_state.target_country)
+        advice = st.session_state.ai_advice_cache.get(advice_key)
+        metrics.cache_lookup("advice", advice is not None)
+        with st.expander("🤖 AI 建議", expanded=advice is not None):
+            if advice:
+                st.markdown(f'<div class="ai-box">{advice}</div>', unsafe_allow_html=True)
+            elif st.button("✨ 產生建議", key=f"live_ai_{curr.id}"):
+                text = st.write_stream(ai.get_ai_step_advice_stream(curr, st.session_state.target_country, get_secret("GEMINI_API_KEY")))
+                if text and not text.startswith(ai.ADVICE_ERROR_PREFIXES):
+                    st.session_state.ai_advice_cache[advice_key] = text
         
         with st.expander("💰 快速記帳", expanded=False):
-            if real_item:
-                input_method = st.radio("方式", ["📸 拍照", "📂 上傳"], horizontal=True, key=f"live_in_{curr['id']}")
-                uploaded_receipt = None
-                if input_method == "📸 拍照":
-                    if st.toggle("🔴 啟動相機", key=f"live_cam_tog_{curr['id']}"):
-                        uploaded_receipt = st.camera_input("拍照", key=f"live_cam_{curr['id']}")
-                else:
-                    uploaded_receipt = st.file_uploader("上傳", type=["jpg","png"], key=f"live_upl_{curr['id']}")
-                
-                scan_flag = f"live_scan_{curr['id']}"
-                if uploaded_receipt and not st.session_state.get(scan_flag, False):
-                    with st.spinner("分析中..."):
-                        results = analyze_receipt_image(uploaded_receipt)
-                    if isinstance(results, list):
-                        cnt = 0
-                        for res in results:
-                            if res.get('price', 0) > 0:
-                                real_item['expenses'].append(res)
-                                cnt += 1
-                        if cnt > 0:
-                            real_item['cost'] = sum(x['price'] for x in real_item['expenses'])
-                            st.success(f"已加入 {cnt} 筆")
-                            st.session_state[scan_flag] = True
-                            time.sleep(1)
-                            st.rerun()
-                if not uploaded_receipt and st.session_state.get(scan_flag, False):
-                    st.session_state[scan_flag] = False
-
-                cx1, cx2, cx3 = st.columns([2, 1, 1])
-                new_n = cx1.text_input("項目", key=f"live_n_{curr['id']}", label_visibility="collapsed")
-                new_p = cx2.number_input("金額", min_value=0, key=f"live_p_{curr['id']}", label_visibility="collapsed")
-                if cx3.button("➕", key=f"live_add_{curr['id']}"):
-                    if new_n and new_p > 0:
-                        real_item['expenses'].append({"name": new_n, "price": new_p})
-                        real_item['cost'] = sum(x['price'] for x in real_item['expenses'])
+            # 收據看起來屬於別的行程：讓使用者決定記到哪裡
+            pending = st.session_state.get("pending_receipt")
+            if pending and pending['from_id'] == curr.id:
+                sug_item = find_item(st.session_state.trip_data, pending['day'], pending['item_id'])
+                if sug_item:
+                    st.info(f"🧾 這張收據看起來屬於 Day {pending['day']}「{sug_item.title}」")
+                    target = None
+                    cp1, cp2 = st.columns(2)
+                    if cp1.button(f"記到「{sug_item.title}」", key="pending_to_sug"): target = (pending['day'], sug_item)
+                    if cp2.button("記到目前行程", key="pending_to_curr"): target = (day_num, curr)
+                    if target:
+                        record_receipt(target[1], target[0], pending['lines'], pending['fp'])
+                        del st.session_state.pending_receipt
                         st.rerun()
+                else:
+                    del st.session_state.pending_receipt
+
+            # 看起來重複的花費：也可能真的又買了一次，讓使用者決定
+            dup_pending = st.session_state.get("pending_dup")
+            if dup_pending and dup_pending['from_id'] == curr.id:
+                st.warning(dup_pending['msg'])
+                cd1, cd2 = st.columns(2)
+                if cd1.button("仍要記錄", key="dup_keep"):
+                    if dup_pending.get('sug'):
+                        st.session_state.pending_receipt = {"lines": dup_pending['lines'], "fp": dup_pending['fp'], "day": dup_pending['sug'][0],
+                                                            "item_id": dup_pending['sug'][1], "from_id": curr.id}
+                    elif dup_pending.get('lines'): record_receipt(curr, day_num, dup_pending['lines'], dup_pending['fp'])
+                    else: record_line(curr, day_num, dup_pending['name'], dup_pending['price'])
+                    del st.session_state.pending_dup
+                    st.rerun()
+                if cd2.button("略過", key="dup_skip"):
+                    del st.session_state.pending_dup
+                    st.rerun()
+
+            input_method = st.radio("方式", ["📸 拍照", "📂 上傳"], horizontal=True, key=f"live_in_{curr.id}")
+            uploaded_receipt = None
+            if input_method == "📸 拍照":
+                if st.toggle("🔴 啟動相機", key=f"live_cam_tog_{curr.id}"):
+                    uploaded_receipt = st.camera_input("拍照", key=f"live_cam_{curr.id}")
+            else:
+                uploaded_receipt = st.file_uploader("上傳", type=["jpg","png"], key=f"live_upl_{curr.id}")
+            
+            scan_flag = f"live_scan_{curr.id}"
+            if uploaded_receipt and not st.session_state.get(scan_flag, False):
+                with st.spinner("分析中..."):
+                    results = ai.analyze_receipt_image(uploaded_receipt, get_secret("GEMINI_API_KEY"))
+                # 不論成功與否都只分析一次，避免每次 rerun 重送同一張圖
+                st.session_state[scan_flag] = True
+                lines = [r for r in results if r.get('price', 0) > 0] if isinstance(results, list) else []
+                fp = matching.receipt_fingerprint(lines) if lines else None
+                now = local_now()
+                dup = st.session_state.expense_index.find_receipt(fp, now) if fp else None
+                store = next((x['store'] for x in lines if x.get('store')), None)
+                sug = matching.suggest_item(st.session_state.trip_data, st.session_state.start_date, now,
+                                            [x['name'] for x in lines], store) if lines else None
+                if not lines:
+                    st.warning("辨識不到金額，請重拍或手動輸入")
+                elif dup:
+                    st.session_state.pending_dup = {"from_id": curr.id, "msg": f"🧾 這張收據剛記在 Day {dup[0]}「{dup[1].title}」",
+                                                    "lines": lines, "fp": fp, "sug": (sug[0], sug[1].id) if sug and sug[1] is not curr else None}
+                    st.rerun()
+                elif sug and sug[1] is not curr:
+                    st.session_state.pending_receipt = {"lines": lines, "fp": fp, "day": sug[0], "item_id": sug[1].id, "from_id": curr.id}
+                    st.rerun()
+                else:
+                    cnt = record_receipt(curr, day_num, lines, fp)
+                    st.success(f"已加入 {cnt} 筆")
+                    time.sleep(1)
+                    st.rerun()
+            if not uploaded_receipt and st.session_state.get(scan_flag, False):
+                st.session_state[scan_flag] = False
+
+            cx1, cx2, cx3 = st.columns([2, 1, 1])
+            new_n = cx1.text_input("項目", key=f"live_n_{curr.id}", label_visibility="collapsed")
+            new_p = cx2.number_input("金額", min_value=0, key=f"live_p_{curr.id}", label_visibility="collapsed")
+            if cx3.button("➕", key=f"live_add_{curr.id}"):
+                if new_n and new_p > 0:
+                    if st.session_state.expense_index.find_line(new_n, new_p, local_now()):
+                        st.session_state.pending_dup = {"from_id": curr.id, "msg": f"剛剛已記過「{new_n}」¥{new_p:,}", "name": new_n, "price": new_p}
+                    else:
+                        record_line(curr, day_num, new_n, new_p)
+                    st.rerun()
 
-                if real_item.get('expenses'):
-                    st.divider()
-                    st.caption(f"已記錄花費 (總計 ¥{real_item['cost']:,})")
-                    for ex in real_item['expenses']:
-                        st.text(f"{ex['name']} : ¥{ex['price']:,}")
+            if curr.expenses:
+                st.divider()
+                st.caption(f"已記錄花費 (總計 ¥{curr.actual:,})")
+                for ex in curr.expenses:
+                    st.text(f"{ex.name} : ¥{ex.price:,}")
 
         st.markdown("---")
         c_back, c_next = st.columns([1, 2])
@@ -575,67 +482,82 @@ with tab1:
                 st.rerun()
         if c_next.button("✅ 完成，前往下一站 ➡️", type="primary", use_container_width=True):
             st.session_state.current_step_index += 1
+            prefetcher.schedule(all_steps, st.session_state.current_step_index, st.session_state.ai_advice_cache)
             st.rerun()
 
 # ==========================================
 # 2. 行程規劃
 # ==========================================
-with tab2:
+with tab2, metrics.span("tab_render", tab="itinerary"):
     selected_day_num = st.radio("DaySelect", list(range(1, st.session_state.trip_days_count + 1)), 
                                 index=0, horizontal=True, label_visibility="collapsed", 
                                 format_func=lambda x: f"Day {x}")
     
     current_date = st.session_state.start_date + timedelta(days=selected_day_num - 1)
     current_items = st.session_state.trip_data[selected_day_num]
-    current_items.sort(key=lambda x: x['time'])
+    current_items.sort(key=lambda x: x.time)
     
-    all_cost = sum([item.get('cost', 0) for item in current_items])
-    all_actual = sum([sum(x['price'] for x in item.get('expenses', [])) for item in current_items])
+    all_cost, all_actual = st.session_state.budget_ledger.day_totals(selected_day_num)
     
     c1, c2 = st.columns(2)
     c1.metric("預算", f"¥{all_cost:,}")
     c2.metric("支出", f"¥{all_actual:,}", delta=f"{all_cost - all_actual:,}" if all_actual > 0 else None)
+
+    fc = forecast.project(st.session_state.budget_ledger, st.session_state.start_date, st.session_state.trip_days_count, local_now())
+    if fc.alerts:
+        more = f"（另有 {len(fc.alerts) - 1} 項）" if len(fc.alerts) > 1 else ""
+        st.warning(f"⚠️ {fc.alerts[0]}{more}")
+    with st.expander(f"📈 預算預測：預計 ¥{fc.projected:,} / 預算 ¥{fc.planned:,}", expanded=False):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("已花費", f"¥{fc.spent:,}")
+        c2.metric("預計總支出", f"¥{fc.projected:,}", delta=f"{fc.projected - fc.planned:,}", delta_color="inverse")
+        c3.metric("總預算", f"¥{fc.planned:,}")
+        st.caption(f"已過 {fc.elapsed} / {fc.days} 天；有預算的分類依目前「實際 / 預算」比例推估，沒預算的依已過行程的平均花費乘上剩下的同類行程數")
+        if fc.cats:
+            # 用 markdown 表格：st.dataframe 會載入 pandas，而這個 expander 收合時也會執行
+            st.markdown("| 分類 | 預算 | 已花 | 每日 | 預計 |\n|---|--:|--:|--:|--:|\n" + "\n".join(
+                f"| {forecast.CATS[c.cat]} | ¥{c.planned:,} | ¥{c.spent:,} | ¥{c.per_day:,} | ¥{c.projected:,} |" for c in fc.cats))
+        for msg in fc.alerts: st.markdown(f"- ⚠️ {msg}")
     st.markdown("---")
     
     is_edit_mode = st.toggle("編輯模式")
     if is_edit_mode and st.button("➕ 新增行程", use_container_width=True):
-        st.session_state.trip_data[selected_day_num].append({"id": int(datetime.now().timestamp()), "time": "09:00", "title": "新行程", "loc": "", "cost": 0, "cat": "other", "note": "", "expenses": [], "trans_mode": "📍 移動", "trans_min": 30})
+        st.session_state.trip_data[selected_day_num].append(new_item())
         st.rerun()
 
     for index, item in enumerate(current_items):
-        map_link = f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote(item['loc'])}" if item['loc'] else "#"
-        map_btn = f'<a href="{map_link}" target="_blank" style="text-decoration:none; margin-left:8px; font-size:0.8rem; background:{c_sec}; color:{c_text}; padding:2px 8px; border-radius:10px; opacity:0.8;">🗺️</a>' if item['loc'] else ""
-        cost_display = f'<div style="background:{c_primary}; color:white; padding:3px 8px; border-radius:12px; font-size:0.75rem; font-weight:bold; white-space:nowrap;">¥{sum(x["price"] for x in item.get("expenses", [])):,}</div>' if item.get('expenses') else ""
+        map_link = generate_google_search_link(item.loc)
+        map_btn = f'<a href="{map_link}" target="_blank" style="text-decoration:none; margin-left:8px; font-size:0.8rem; background:{c_sec}; color:{c_text}; padding:2px 8px; border-radius:10px; opacity:0.8;">🗺️</a>' if item.loc else ""
+        cost_display = f'<div style="background:{c_primary}; color:white; padding:3px 8px; border-radius:12px; font-size:0.75rem; font-weight:bold; white-space:nowrap;">¥{item.actual:,}</div>' if item.expenses else ""
         
-        st.markdown(f"""<div style="display:flex; gap:15px; margin-bottom:0px;"><div style="display:flex; flex-direction:column; align-items:center; width:50px;"><div style="font-weight:700; color:{c_text}; font-size:1.1rem;">{item['time']}</div><div style="flex-grow:1; width:2px; background:{c_sec}; margin:5px 0; opacity:0.3; border-radius:2px;"></div></div><div style="flex-grow:1;"><div class="apple-card" style="margin-bottom:0px;"><div style="display:flex; justify-content:space-between; align-items:flex-start;"><div class="apple-title" style="margin-top:0;">{item['title']}</div>{cost_display}</div><div class="apple-loc">📍 {item['loc'] or '未設定'} {map_btn}</div><div style="font-size:0.85rem; color:{c_sub}; background:{c_bg}; padding:8px; border-radius:8px; margin-top:8px; line-height:1.4;">📝 {item['note']}</div></div></div></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div style="display:flex; gap:15px; margin-bottom:0px;"><div style="display:flex; flex-direction:column; align-items:center; width:50px;"><div style="font-weight:700; color:{c_text}; font-size:1.1rem;">{item.time}</div><div style="flex-grow:1; width:2px; background:{c_sec}; margin:5px 0; opacity:0.3; border-radius:2px;"></div></div><div style="flex-grow:1;"><div class="apple-card" style="margin-bottom:0px;"><div style="display:flex; justify-content:space-between; align-items:flex-start;"><div class="apple-title" style="margin-top:0;">{item.title}</div>{cost_display}</div><div class="apple-loc">📍 {item.loc or '未設定'} {map_btn}</div><div style="font-size:0.85rem; color:{c_sub}; background:{c_bg}; padding:8px; border-radius:8px; margin-top:8px; line-height:1.4;">📝 {item.note}</div></div></div></div>""", unsafe_allow_html=True)
         
-        if item.get('expenses'):
-            total_ex = sum(x['price'] for x in item['expenses'])
-            with st.expander(f"🧾 明細 (¥{total_ex:,})", expanded=False):
-                for exp in item['expenses']:
-                    st.markdown(f"- {exp['name']}: ¥{exp['price']:,}")
+        if item.expenses:
+            with st.expander(f"🧾 明細 (¥{item.actual:,})", expanded=False):
+                for exp in item.expenses:
+                    st.markdown(f"- {exp.name}: ¥{exp.price:,}")
 
         if is_edit_mode:
             with st.expander("✏️ 編輯", expanded=False):
                 c1, c2 = st.columns([2, 1])
-                item['title'] = c1.text_input("名稱", item['title'], key=f"t_{item['id']}")
-                item['time'] = c2.time_input("時間", datetime.strptime(item['time'], "%H:%M").time(), key=f"tm_{item['id']}").strftime("%H:%M")
-                item['loc'] = st.text_input("地點", item['loc'], key=f"l_{item['id']}")
-                item['note'] = st.text_area("備註", item['note'], key=f"n_{item['id']}")
-                if st.button("🗑️ 刪除", key=f"del_{item['id']}"):
+                item.title = c1.text_input("名稱", item.title, key=f"t_{item.id}")
+                item.time = c2.time_input("時間", datetime.strptime(item.time, "%H:%M").time(), key=f"tm_{item.id}").strftime("%H:%M")
+                item.loc = st.text_input("地點", item.loc, key=f"l_{item.id}")
+                item.note = st.text_area("備註", item.note, key=f"n_{item.id}")
+                if st.button("🗑️ 刪除", key=f"del_{item.id}"):
                     st.session_state.trip_data[selected_day_num].pop(index)
                     st.rerun()
         
         if index < len(current_items) - 1:
             next_item = current_items[index+1]
-            nav_link = generate_google_nav_link(item['loc'], next_item['loc'])
-            t_mode = item.get('trans_mode', '📍 移動')
-            st.markdown(f"""<div style="display:flex; gap:15px;"><div style="display:flex; flex-direction:column; align-items:center; width:50px;"><div style="flex-grow:1; width:2px; border-left:2px dashed {c_sec}; margin:0; opacity:0.6;"></div></div><div style="flex-grow:1; padding:5px 0;"><div class="trans-card"><div style="display:flex; flex-direction:column;"><div style="font-size:0.7rem; color:#888; margin-bottom:2px;">推薦路線 (RECOMMENDED)</div><div style="display:flex; align-items:center; gap:8px;"><div style="font-weight:bold; font-size:0.9rem;">{t_mode}</div><div class="trans-tag">最快速</div></div></div><div style="text-align:right;"><div style="font-weight:bold; font-size:0.9rem;">{item.get('trans_min', 30)} min</div><a href="{nav_link}" target="_blank" style="text-decoration:none; font-size:0.75rem; color:#007AFF;">➤ 導航</a></div></div></div></div>""", unsafe_allow_html=True)
+            nav_link = generate_google_nav_link(item.loc, next_item.loc)
+            t_mode = item.trans_mode
+            st.markdown(f"""<div style="display:flex; gap:15px;"><div style="display:flex; flex-direction:column; align-items:center; width:50px;"><div style="flex-grow:1; width:2px; border-left:2px dashed {c_sec}; margin:0; opacity:0.6;"></div></div><div style="flex-grow:1; padding:5px 0;"><div class="trans-card"><div style="display:flex; flex-direction:column;"><div style="font-size:0.7rem; color:#888; margin-bottom:2px;">推薦路線 (RECOMMENDED)</div><div style="display:flex; align-items:center; gap:8px;"><div style="font-weight:bold; font-size:0.9rem;">{t_mode}</div><div class="trans-tag">最快速</div></div></div><div style="text-align:right;"><div style="font-weight:bold; font-size:0.9rem;">{item.trans_min} min</div><a href="{nav_link}" target="_blank" style="text-decoration:none; font-size:0.75rem; color:#007AFF;">➤ 導航</a></div></div></div></div>""", unsafe_allow_html=True)
 
 # ==========================================
 # 3. 願望清單
 # ==========================================
-with tab3:
+with tab3, metrics.span("tab_render", tab="wishlist"):
     col_wish_1, col_wish_2 = st.columns([2, 1])
     col_wish_1.subheader("✨ 願望清單")
     
@@ -644,14 +566,9 @@ with tab3:
         raw_text = st.text_area("貼上文字...", height=100)
         if st.button("🪄 AI 解析加入"):
             with st.spinner("AI 正在閱讀中..."):
-                res = parse_wishlist_text(raw_text)
+                res = ai.parse_wishlist_text(raw_text, get_secret("GEMINI_API_KEY"))
                 if res and 'title' in res:
-                    st.session_state.wishlist.append({
-                        "id": int(time.time()), 
-                        "title": res.get('title', '未命名'), 
-                        "loc": res.get('loc', ''), 
-                        "note": res.get('note', '')
-                    })
+                    st.session_state.wishlist.append(Wish(int(time.time()), res.get('title', '未命名'), res.get('loc', ''), res.get('note', '')))
                     st.success("成功加入！")
                     time.sleep(1)
                     st.rerun()
@@ -663,27 +580,27 @@ with tab3:
         w_loc = st.text_input("地點")
         w_note = st.text_input("備註")
         if st.button("加入") and w_title:
-            st.session_state.wishlist.append({"id": int(time.time()), "title": w_title, "loc": w_loc, "note": w_note})
+            st.session_state.wishlist.append(Wish(int(time.time()), w_title, w_loc, w_note))
             st.rerun()
 
     for i, wish in enumerate(st.session_state.wishlist):
         with st.container():
-            st.markdown(f"""<div class="apple-card" style="padding:15px; margin-bottom:10px; border-left:4px solid {c_primary};"><div style="font-weight:bold; font-size:1.1rem;">{wish['title']}</div><div style="font-size:0.9rem; color:{c_sub};">📍 {wish['loc']}｜📝 {wish['note']}</div></div>""", unsafe_allow_html=True)
+            st.markdown(f"""<div class="apple-card" style="padding:15px; margin-bottom:10px; border-left:4px solid {c_primary};"><div style="font-weight:bold; font-size:1.1rem;">{wish.title}</div><div style="font-size:0.9rem; color:{c_sub};">📍 {wish.loc}｜📝 {wish.note}</div></div>""", unsafe_allow_html=True)
             c1, c2, c3 = st.columns([2, 1, 1])
-            target_day = c1.selectbox("移至", list(range(1, st.session_state.trip_days_count + 1)), key=f"wd_{wish['id']}")
-            if c2.button("排程", key=f"wm_{wish['id']}"):
-                new_item = {"id": int(time.time()), "time": "09:00", "title": wish['title'], "loc": wish['loc'], "cost": 0, "cat": "spot", "note": wish['note'], "expenses": [], "trans_mode": "📍 移動", "trans_min": 30}
-                st.session_state.trip_data[target_day].append(new_item)
+            target_day = c1.selectbox("移至", list(range(1, st.session_state.trip_days_count + 1)), key=f"wd_{wish.id}")
+            if c2.button("排程", key=f"wm_{wish.id}"):
+                st.session_state.trip_data[target_day].append(
+                    new_item(wish.title, loc=wish.loc, note=wish.note, cat="spot", item_id=int(time.time())))
                 st.session_state.wishlist.pop(i)
                 st.rerun()
-            if c3.button("刪", key=f"wdl_{wish['id']}"):
+            if c3.button("刪", key=f"wdl_{wish.id}"):
                 st.session_state.wishlist.pop(i)
                 st.rerun()
 
 # ==========================================
 # 4. 準備清單 (可編輯版)
 # ==========================================
-with tab4:
+with tab4, metrics.span("tab_render", tab="checklist"):
     col_check_1, col_check_2 = st.columns([4, 1])
     col_check_1.subheader("🎒 準備清單")
     # [Fix] Added key to prevent duplicate ID error
@@ -733,7 +650,7 @@ with tab4:
 # ==========================================
 # 5. 資訊 (可編輯版)
 # ==========================================
-with tab5:
+with tab5, metrics.span("tab_render", tab="info"):
     col_info_head, col_info_edit = st.columns([4, 1])
     col_info_head.subheader("✈️ 航班")
     
@@ -747,50 +664,50 @@ with tab5:
     if is_info_edit:
         st.markdown("**去程 (Outbound)**")
         c1, c2, c3 = st.columns(3)
-        f_out['date'] = c1.text_input("日期", f_out['date'], key="fd_out")
-        f_out['code'] = c2.text_input("班號", f_out['code'], key="fc_out")
+        f_out.date = c1.text_input("日期", f_out.date, key="fd_out")
+        f_out.code = c2.text_input("班號", f_out.code, key="fc_out")
         c1, c2 = st.columns(2)
-        f_out['dep'] = c1.text_input("起飛時間", f_out['dep'], key="ft_d_out")
-        f_out['arr'] = c2.text_input("抵達時間", f_out['arr'], key="ft_a_out")
-        f_out['dep_loc'] = c1.text_input("起飛地", f_out['dep_loc'], key="fl_d_out")
-        f_out['arr_loc'] = c2.text_input("抵達地", f_out['arr_loc'], key="fl_a_out")
+        f_out.dep = c1.text_input("起飛時間", f_out.dep, key="ft_d_out")
+        f_out.arr = c2.text_input("抵達時間", f_out.arr, key="ft_a_out")
+        f_out.dep_loc = c1.text_input("起飛地", f_out.dep_loc, key="fl_d_out")
+        f_out.arr_loc = c2.text_input("抵達地", f_out.arr_loc, key="fl_a_out")
         
         st.divider()
         st.markdown("**回程 (Inbound)**")
         c1, c2, c3 = st.columns(3)
-        f_in['date'] = c1.text_input("日期", f_in['date'], key="fd_in")
-        f_in['code'] = c2.text_input("班號", f_in['code'], key="fc_in")
+        f_in.date = c1.text_input("日期", f_in.date, key="fd_in")
+        f_in.code = c2.text_input("班號", f_in.code, key="fc_in")
         c1, c2 = st.columns(2)
-        f_in['dep'] = c1.text_input("起飛時間", f_in['dep'], key="ft_d_in")
-        f_in['arr'] = c2.text_input("抵達時間", f_in['arr'], key="ft_a_in")
-        f_in['dep_loc'] = c1.text_input("起飛地", f_in['dep_loc'], key="fl_d_in")
-        f_in['arr_loc'] = c2.text_input("抵達地", f_in['arr_loc'], key="fl_a_in")
+        f_in.dep = c1.text_input("起飛時間", f_in.dep, key="ft_d_in")
+        f_in.arr = c2.text_input("抵達時間", f_in.arr, key="ft_a_in")
+        f_in.dep_loc = c1.text_input("起飛地", f_in.dep_loc, key="fl_d_in")
+        f_in.arr_loc = c2.text_input("抵達地", f_in.arr_loc, key="fl_a_in")
     else:
         st.markdown(f"""
         <div class="flight-card">
-            <div class="flight-header"><span>DEPARTURE</span><span>{f_out['date']}</span></div>
+            <div class="flight-header"><span>DEPARTURE</span><span>{f_out.date}</span></div>
             <div class="flight-route">
-                <div class="flight-code">{f_out['dep_loc']}</div>
+                <div class="flight-code">{f_out.dep_loc}</div>
                 <div class="flight-plane">✈</div>
-                <div class="flight-code">{f_out['arr_loc']}</div>
+                <div class="flight-code">{f_out.arr_loc}</div>
             </div>
             <div style="display:flex; justify-content:space-between; font-weight:bold;">
-                <div>{f_out['dep']}</div>
-                <div>{f_out['code']}</div>
-                <div>{f_out['arr']}</div>
+                <div>{f_out.dep}</div>
+                <div>{f_out.code}</div>
+                <div>{f_out.arr}</div>
             </div>
         </div>
         <div class="flight-card">
-            <div class="flight-header"><span>RETURN</span><span>{f_in['date']}</span></div>
+            <div class="flight-header"><span>RETURN</span><span>{f_in.date}</span></div>
             <div class="flight-route">
-                <div class="flight-code">{f_in['dep_loc']}</div>
+                <div class="flight-code">{f_in.dep_loc}</div>
                 <div class="flight-plane">✈</div>
-                <div class="flight-code">{f_in['arr_loc']}</div>
+                <div class="flight-code">{f_in.arr_loc}</div>
             </div>
             <div style="display:flex; justify-content:space-between; font-weight:bold;">
-                <div>{f_in['dep']}</div>
-                <div>{f_in['code']}</div>
-                <div>{f_in['arr']}</div>
+                <div>{f_in.dep}</div>
+                <div>{f_in.code}</div>
+                <div>{f_in.arr}</div>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -801,16 +718,16 @@ with tab5:
     if is_info_edit:
         if st.button("➕ 新增飯店"):
             new_id = len(st.session_state.hotel_info) + 1
-            st.session_state.hotel_info.append({"id": new_id, "name": "新飯店", "range": "", "date": "", "addr": "", "link": ""})
+            st.session_state.hotel_info.append(Hotel(new_id, "新飯店"))
             st.rerun()
             
         for i, hotel in enumerate(st.session_state.hotel_info):
-            with st.expander(f"編輯: {hotel['name']}", expanded=True):
-                hotel['name'] = st.text_input("名稱", hotel['name'], key=f"hn_{i}")
+            with st.expander(f"編輯: {hotel.name}", expanded=True):
+                hotel.name = st.text_input("名稱", hotel.name, key=f"hn_{i}")
                 c1, c2 = st.columns(2)
-                hotel['range'] = c1.text_input("天數(e.g. D1-D3)", hotel['range'], key=f"hr_{i}")
-                hotel['date'] = c2.text_input("日期", hotel['date'], key=f"hd_{i}")
-                hotel['addr'] = st.text_input("地址", hotel['addr'], key=f"ha_{i}")
+                hotel.range = c1.text_input("天數(e.g. D1-D3)", hotel.range, key=f"hr_{i}")
+                hotel.date = c2.text_input("日期", hotel.date, key=f"hd_{i}")
+                hotel.addr = st.text_input("地址", hotel.addr, key=f"ha_{i}")
                 if st.button("🗑️ 刪除", key=f"hdel_{i}"):
                     st.session_state.hotel_info.pop(i)
                     st.rerun()
@@ -820,12 +737,12 @@ with tab5:
             <div class="hotel-card">
                 <div class="hotel-img-placeholder">🏨</div>
                 <div class="hotel-body">
-                    <div class="hotel-name">{hotel['name']}</div>
+                    <div class="hotel-name">{hotel.name}</div>
                     <div class="hotel-meta">
-                        <span class="hotel-badge">{hotel['range']}</span>
-                        <span>{hotel['date']}</span>
+                        <span class="hotel-badge">{hotel.range}</span>
+                        <span>{hotel.date}</span>
                     </div>
-                    <div class="hotel-meta" style="margin-top:8px;">📍 {hotel['addr']}</div>
+                    <div class="hotel-meta" style="margin-top:8px;">📍 {hotel.addr}</div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -833,7 +750,7 @@ with tab5:
 # ==========================================
 # 6. 工具
 # ==========================================
-with tab6:
+with tab6, metrics.span("tab_render", tab="tools"):
     st.header("🧰 實用工具")
     
     st.subheader("💴 匯率計算")
@@ -857,51 +774,64 @@ with tab6:
     
     st.subheader("🗣️ 旅遊實用會話")
     target_c = st.session_state.target_country
+    pack = phrases.get_pack(target_c)
     
-    if target_c in SURVIVAL_PHRASES:
-        phrases = SURVIVAL_PHRASES[target_c]
-        tabs = st.tabs(list(phrases.keys()))
-        for i, (category, items) in enumerate(phrases.items()):
-            with tabs[i]:
-                for zh, local in items:
-                    st.markdown(f"""
-                    <div style="background:{c_bg}; border:1px solid {c_sec}; padding:12px; border-radius:10px; margin-bottom:8px; display:flex; justify-content:space-between; align-items:center;">
-                        <span style="font-weight:bold; color:{c_text};">{zh}</span>
-                        <span style="color:{c_primary}; font-weight:bold; font-size:1.1rem;">{local}</span>
-                    </div>
-                    """, unsafe_allow_html=True)
-    else:
-        st.info("目前僅支援 日/韓/泰 地區的會話")
+    if pack is None:
+        st.info(f"還沒有「{target_c}」的會話包")
+        if st.button("✨ AI 產生會話包", key="gen_phrase_pack"):
+            with st.spinner("AI 正在整理會話..."):
+                pack = phrases.generate_pack(target_c, get_secret("GEMINI_API_KEY"))
+            if pack is None: st.error("產生失敗，請稍後再試")
+            else: st.rerun()
+    if pack is not None:
+        missing = phrases.missing_audio(pack)
+        has_audio = len(missing) < len(pack.texts())
+        tabs = st.tabs(list(pack.phrases.keys()))
+        for tab, (category, rows) in zip(tabs, pack.phrases.items()):
+            with tab:
+                # 整個分類一次輸出，不再每句一個元素
+                st.markdown("".join(f"""<div style="background:{c_bg}; border:1px solid {c_sec}; padding:12px; border-radius:10px; margin-bottom:8px; display:flex; justify-content:space-between; align-items:center;"><span style="font-weight:bold; color:{c_text};">{zh}</span><span style="text-align:right;"><span style="color:{c_primary}; font-weight:bold; font-size:1.1rem;">{local}</span>{f'<br><span style="color:{c_sub}; font-size:0.8rem;">{roman}</span>' if roman else ''}</span></div>""" for zh, local, roman in rows), unsafe_allow_html=True)
+                if has_audio:
+                    say = st.selectbox("🔊 播放", rows, format_func=lambda r: r[0], key=f"say_{category}")
+                    clip = phrases.get_audio(pack, say[1])
+                    if clip: st.audio(clip, format="audio/mpeg")
+        if TTS_AVAILABLE and missing and st.button(f"🔊 產生語音 ({len(missing)} 句)", key="build_phrase_audio"):
+            with st.spinner("產生語音中..."):
+                phrases.build_audio(pack)
+            st.rerun()
+        # 頁面上的播放要連到伺服器；沒網路的地方用下載的離線包 (按下才打包)
+        st.download_button("📦 下載離線包 (zip，含語音)" if has_audio else "📦 下載離線包 (zip)", lambda: phrases.bundle(pack),
+                           file_name=f"phrases_{pack.lang}.zip", mime="application/zip", key="phrase_bundle")
 
     st.divider()
     
     st.subheader("🛍️ 購物清單")
-    edited_df = st.data_editor(st.session_state.shopping_list, num_rows="dynamic", key="shop_edit", use_container_width=True)
-    if not edited_df.equals(st.session_state.shopping_list):
-        st.session_state.shopping_list = edited_df
-        st.rerun()
+    # data_editor 一定會載入 pandas：展開時才畫，沒用到購物清單的 session 不必付這個成本
+    shop_exp = st.expander(f"編輯購物清單 ({len(st.session_state.shopping_list)} 項)", key="shop_exp", on_change="rerun")
+    if shop_exp.open:
+        with shop_exp:
+            shop_df = get_pandas().DataFrame(st.session_state.shopping_list, columns=SHOPPING_COLUMNS)
+            edited_df = st.data_editor(shop_df, num_rows="dynamic", key="shop_edit", use_container_width=True)
+            if not edited_df.equals(shop_df):
+                st.session_state.shopping_list = edited_df.to_dict("records")
+                st.rerun()
 
     st.divider()
     
     st.subheader("🆘 緊急求助")
-    target_country_sos = st.session_state.target_country
-    sos_map = {
-        "日本": {"迷路": "迷子になりました", "過敏": "アレルギーがあります", "醫院": "病院に連れて行って"},
-        "韓國": {"迷路": "길을 잃었어요", "過敏": "알레르기가 있어요", "醫院": "병원으로 가주세요"},
-        "泰國": {"迷路": "Long tang", "過敏": "Pae a-han", "醫院": "Bai rong paya ban"}
-    }
-    
-    if target_country_sos in sos_map:
-        s_type = st.selectbox("選擇緊急狀況", list(sos_map[target_country_sos].keys()))
-        s_txt = sos_map[target_country_sos][s_type]
+    if pack is not None and pack.sos:
+        s_zh, s_txt, s_roman = st.selectbox("選擇緊急狀況", pack.sos, format_func=lambda r: r[0])
         st.markdown(f"""
         <div class="sos-card">
             <div class="sos-sub">請向當地人出示此畫面</div>
             <div class="sos-title">{s_txt}</div>
+            <div class="sos-sub">{s_roman}</div>
         </div>
         """, unsafe_allow_html=True)
+        clip = phrases.get_audio(pack, s_txt)
+        if clip: st.audio(clip, format="audio/mpeg")
     else:
-        st.info("目前僅支援 日/韓/泰")
+        st.info("請先在上方產生會話包")
         
     st.divider()
     
@@ -909,17 +839,52 @@ with tab6:
     c1, c2 = st.columns(2)
     if c1.button("☁️ 上傳"):
         if CLOUD_AVAILABLE:
-            data = {"trip": st.session_state.trip_data, "wish": st.session_state.wishlist, "check": st.session_state.checklist}
-            res = save_to_cloud(json.dumps(data, default=str))
+            json_str = sync.dump_state(st.session_state.trip_data, st.session_state.wishlist, st.session_state.checklist,
+                                       st.session_state.hotel_info, st.session_state.flight_info)
+            res = sync.save_to_cloud(json_str, get_secret("gcp_service_account"))
             st.toast(res[1] if res[0] else f"錯誤: {res[1]}")
         else: st.error("缺少雲端套件 (gspread)")
     if c2.button("📥 下載"):
         if CLOUD_AVAILABLE:
-            raw = load_from_cloud()
+            raw = sync.load_from_cloud(get_secret("gcp_service_account"))
             if raw:
-                d = json.loads(raw)
-                if "trip" in d: st.session_state.trip_data = {int(k):v for k,v in d['trip'].items()}
+                d = sync.load_state(raw)
+                st.session_state.trip_data = d['trip']
+                if "wish" in d: st.session_state.wishlist = d['wish']
+                if "check" in d and is_valid_checklist(d['check']): st.session_state.checklist = d['check']
+                if "hotel" in d: st.session_state.hotel_info = d['hotel']
+                if "flight" in d: st.session_state.flight_info = d['flight']
                 st.toast("成功")
                 time.sleep(1)
                 st.rerun()
         else: st.error("缺少雲端套件 (gspread)")
+
+# ==========================================
+# 🐞 效能面板
+# ==========================================
+rerun_s = time.perf_counter() - rerun_t0
+metrics.observe("rerun", rerun_s)
+metrics.stop_trace()
+
+if DEBUG_MODE:
+    with st.expander("🐞 效能面板", expanded=False):
+        st.caption(f"本次 rerun：{rerun_s * 1000:.1f} ms")
+        st.dataframe([{"span": n, "labels": ", ".join(f"{k}={v}" for k, v in l.items()), "ms": round(sec * 1000, 2)}
+                      for n, l, sec in rerun_spans], use_container_width=True)
+
+        snap = metrics.snapshot()
+        st.markdown("**累計 (整個行程)**")
+        st.dataframe([{"span": n, "labels": ", ".join(f"{k}={v}" for k, v in l.items()), "次數": cnt, "平均 ms": round(avg * 1000, 2)}
+                      for n, l, cnt, avg in snap['spans']], use_container_width=True)
+        if snap['counters']:
+            st.dataframe([{"counter": n, "labels": ", ".join(f"{k}={v}" for k, v in l.items()), "值": v}
+                          for n, l, v in snap['counters']], use_container_width=True)
+        st.download_button("⬇️ OpenMetrics", metrics.render_openmetrics(), file_name="metrics.txt")
+
+        # 開關跟著 profiler 實際狀態走 (時間或 stack 數到上限會自己停)
+        st.session_state.toggle_profiler = metrics.profiler.running
+        st.toggle(f"🔬 取樣 profiler (最多 {metrics.profiler.max_seconds} 秒)", key="toggle_profiler",
+                  on_change=lambda: metrics.profiler.start() if st.session_state.toggle_profiler else metrics.profiler.stop())
+        if metrics.profiler.samples:
+            st.caption(f"已取樣 {metrics.profiler.samples} 次")
+            st.download_button("⬇️ Flamegraph stacks", metrics.profiler.collapsed(), file_name="stacks.collapsed")
@@ -0,0 +1,207 @@
+"""熱點 benchmark：時間軸、每日預算與預測、Excel 匯入、雲端 JSON 序列化 (含舊格式遷移)、整頁 render。
+另外記錄每個 AI prompt 模板的估計 token 數 (structured.TOKENS)，--compare 時一起比較。
+
+    python benchmarks/hotpaths.py                          # 預設大小，結果存到 benchmarks/results/<commit>.json
+    python benchmarks/hotpaths.py --days 30 --items 40     # 自訂行程大小
+    python benchmarks/hotpaths.py --compare benchmarks/results/<舊 commit>.json
+
+Gemini 與 Google Sheets 一律用 stubs.offline() 的本地替身，不需要網路。
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import stubs, synth  # noqa: E402
+from trip_app import forecast, importers, structured, sync  # noqa: E402
+from trip_app.deps import get_pandas  # noqa: E402
+from trip_app.model import Expense, build_timeline, find_item  # noqa: E402
+
+APP_SCRIPT = os.path.join(ROOT, "ai_studio_code (21) (1).py")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def bench(fn, rounds, number=1):
+    """回傳每次呼叫的耗時 (ms)：先暖身一次，再取 rounds 輪的中位數與最小值。"""
+    fn()
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number): fn()
+        samples.append((time.perf_counter() - t0) * 1000 / number)
+    return {"median_ms": round(statistics.median(samples), 4), "min_ms": round(min(samples), 4), "rounds": rounds}
+
+
+def _timeline_case(state):
+    trip_data = state['trip_data']
+    def run():
+        steps = build_timeline(trip_data)
+        if steps:
+            day_num, curr = steps[len(steps) // 2]
+            find_item(trip_data, day_num, curr.id)
+    return run
+
+
+def _budget_case(state):
+    # 📅 行程分頁每次 rerun 的路徑：彙總表同步 (沒有變動) + BudgetLedger.day_totals (app 只讀選中的那天，這裡每天都讀)
+    trip_data = state['trip_data']
+    ledger = forecast.BudgetLedger()
+    ledger.sync(trip_data)
+    def run():
+        ledger.sync(trip_data)
+        for d in trip_data: ledger.day_totals(d)
+    return run
+
+
+def _forecast_case(state):
+    # 模擬快速記帳後的 rerun：彙總表只補上新的一筆，再重新推估
+    trip_data = copy.deepcopy(state['trip_data'])
+    ledger = forecast.BudgetLedger()
+    ledger.sync(trip_data)
+    item = trip_data[1][0]
+    start = datetime(2026, 1, 17)
+    def run():
+        item.expenses.append(item.expenses[0] if item.expenses else Expense("咖啡", 300))
+        ledger.sync(trip_data)
+        forecast.project(ledger, start, len(trip_data), today=start + timedelta(days=len(trip_data) // 2))
+    return run
+
+
+def _excel_case(state):
+    buf = io.BytesIO()
+    get_pandas().DataFrame(synth.trip_to_rows(state['trip_data'])).to_excel(buf, index=False)
+    data = buf.getvalue()
+    return lambda: importers.parse_excel(io.BytesIO(data))
+
+
+def _dump_case(state):
+    return lambda: sync.dump_state(state['trip_data'], state['wishlist'], state['checklist'])
+
+
+def _load_case(state):
+    raw = sync.dump_state(state['trip_data'], state['wishlist'], state['checklist'])
+    return lambda: sync.load_state(raw)
+
+
+def _migrate_case(state):
+    # 舊版 (v1) 雲端資料：每個物件都是 dict
+    raw = json.dumps({"trip": {d: [asdict(it) for it in items] for d, items in state['trip_data'].items()},
+                      "wish": [asdict(w) for w in state['wishlist']], "check": state['checklist']})
+    return lambda: sync.load_state(raw)
+
+
+def _cloud_roundtrip_case(state):
+    def run():
+        sync.save_to_cloud(sync.dump_state(state['trip_data'], state['wishlist'], state['checklist']))
+        sync.load_state(sync.load_from_cloud())
+    return run
+
+
+def _render_case(state):
+    from streamlit.testing.v1 import AppTest
+
+    def run():
+        at = AppTest.from_file(APP_SCRIPT, default_timeout=120)
+        for key in ("trip_data", "trip_days_count", "wishlist", "checklist", "flight_info", "hotel_info"):
+            at.session_state[key] = copy.deepcopy(state[key])
+        at.session_state["shopping_list"] = copy.deepcopy(state['shopping_rows'])
+        at.run()
+        if at.exception: raise RuntimeError(at.exception[0].value)
+    return run
+
+
+CASES = {
+    "timeline_build": (_timeline_case, 50),
+    "day_budget_ledger": (_budget_case, 50),
+    "budget_forecast": (_forecast_case, 50),
+    "process_excel_upload": (_excel_case, 5),
+    "save_to_cloud.dump": (_dump_case, 20),
+    "load_from_cloud.load": (_load_case, 20),
+    "load_from_cloud.migrate_v1": (_migrate_case, 20),
+    "cloud_roundtrip(stub)": (_cloud_roundtrip_case, 10),
+    "app_render(AppTest)": (_render_case, 3),
+}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_compare(results, size, old):
+    print(f"\n與 {old['meta'].get('commit')} 比較")
+    if old['meta'].get('size') != size:
+        print(f"⚠️ 行程大小不同：{old['meta'].get('size')} vs {size}")
+    for name, res in results.items():
+        prev = old['results'].get(name)
+        if not prev: continue
+        ratio = res['median_ms'] / prev['median_ms'] if prev['median_ms'] else float("inf")
+        print(f"{name:<26} {prev['median_ms']:>10.3f} -> {res['median_ms']:>10.3f} ms  (x{ratio:.2f})")
+    for name, tokens in structured.TOKENS.items():
+        prev = old.get('prompt_tokens', {}).get(name)
+        if prev is not None and prev != tokens:
+            print(f"prompt {name:<19} {prev:>10} -> {tokens:>10} tokens")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--items", type=int, default=12, help="每天行程數")
+    parser.add_argument("--expenses", type=int, default=3, help="每個行程的花費筆數")
+    parser.add_argument("--wishlist", type=int, default=50)
+    parser.add_argument("--checklist", type=int, default=80)
+    parser.add_argument("--only", nargs="*", help="只跑指定項目")
+    parser.add_argument("--skip-render", action="store_true", help="不跑 AppTest 整頁 render")
+    parser.add_argument("--out", help="結果檔 (預設 benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="用來比較的舊結果檔")
+    args = parser.parse_args(argv)
+
+    state = synth.generate_trip(args.days, args.items, args.expenses, args.wishlist, args.checklist)
+    results = {}
+    with stubs.offline():
+        for name, (factory, rounds) in CASES.items():
+            if args.only and name not in args.only: continue
+            if args.skip_render and name.startswith("app_render"): continue
+            results[name] = bench(factory(state), rounds)
+            print(f"{name:<26} {results[name]['median_ms']:>10.3f} ms")
+
+    print()
+    for name, tokens in structured.TOKENS.items():
+        print(f"prompt {name:<19} {tokens:>10} tokens")
+
+    commit = git_commit()
+    report = {
+        "meta": {"commit": commit, "python": platform.python_version(),
+                 "size": {"days": args.days, "items": args.items, "expenses": args.expenses,
+                          "wishlist": args.wishlist, "checklist": args.checklist}},
+        "results": results,
+        "prompt_tokens": dict(structured.TOKENS),
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已存到 {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_compare(results, report['meta']['size'], json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
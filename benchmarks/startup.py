@@ -0,0 +1,126 @@
+"""冷啟動匯入成本量測：每個子系統在全新的 Python 行程中各自匯入，另外用 AppTest 整頁跑一次 app。
+
+整頁那一項會檢查選用套件 (LAZY_MODULES) 沒有在第一次 render 就被載入；有的話列出來並 exit 1。
+
+    python benchmarks/startup.py                         # 顯示結果
+    python benchmarks/startup.py --json out.json         # 存檔
+    python benchmarks/startup.py --baseline out.json     # 與舊結果比較，退步超過門檻則 exit 1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBSYSTEMS = {
+    "trip_app core": ["trip_app", "trip_app.importers", "trip_app.sync", "trip_app.ai"],
+    "streamlit": ["streamlit"],
+    "pandas (Excel/購物清單)": ["pandas"],
+    "cloud (gspread)": ["gspread", "oauth2client.service_account"],
+    "ai (gemini)": ["google.generativeai", "PIL.Image"],
+}
+
+# 第一次 render 不該載入的選用套件 (要用到對應功能時才載入)
+LAZY_MODULES = ["pandas", "pyarrow", "gspread", "oauth2client", "google.generativeai", "PIL", "gtts"]
+APP_SCRIPT = os.path.join(ROOT, "ai_studio_code (21) (1).py")
+
+# 在子行程中執行：量匯入耗時 (ms) 與常駐記憶體增量 (KB)
+_PROBE = """
+import json, sys, time, resource, importlib
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+try:
+    for name in sys.argv[1:]: importlib.import_module(name)
+    ok = True
+except ImportError:
+    ok = False
+ms = (time.perf_counter() - t0) * 1000
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"ok": ok, "ms": ms, "rss_kb": after - before}))
+"""
+
+
+# 在子行程中執行：AppTest 跑一次 app (不含 AppTest 本身的匯入)，回傳耗時與已載入的選用套件
+_APP_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t0 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+ms = (time.perf_counter() - t0) * 1000
+loaded = [m for m in sys.argv[2:] if m in sys.modules]
+print(json.dumps({"ok": not at.exception, "ms": ms, "loaded": loaded}))
+"""
+
+
+def measure_app(repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _APP_PROBE, APP_SCRIPT, *LAZY_MODULES], capture_output=True, text=True,
+                             check=True, cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT})
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "ok": all(r["ok"] for r in runs),
+        "ms": round(statistics.median(r["ms"] for r in runs), 2),
+        "loaded": sorted({m for r in runs for m in r["loaded"]}),
+    }
+
+
+def measure(modules, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE, *modules], capture_output=True, text=True, check=True, cwd=ROOT)
+        runs.append(json.loads(out.stdout))
+    if not all(r["ok"] for r in runs):
+        return {"ok": False, "ms": None, "rss_kb": None}
+    return {
+        "ok": True,
+        "ms": round(statistics.median(r["ms"] for r in runs), 2),
+        "rss_kb": int(statistics.median(r["rss_kb"] for r in runs)),
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, res in results.items():
+        old = baseline.get(name)
+        if not (res["ok"] and old and old.get("ok")): continue
+        if res["ms"] > old["ms"] * (1 + threshold):
+            regressions.append(f"{name}: {old['ms']}ms -> {res['ms']}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果輸出檔")
+    parser.add_argument("--baseline", help="用來比較的舊結果")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允許的退步比例 (預設 25%%)")
+    args = parser.parse_args(argv)
+
+    results = {name: measure(mods, args.repeat) for name, mods in SUBSYSTEMS.items()}
+    for name, res in results.items():
+        if res["ok"]: print(f"{name:<28} {res['ms']:>9.1f} ms {res['rss_kb']:>9,} KB")
+        else: print(f"{name:<28} {'未安裝':>9}")
+    app = results["app 冷啟動 (AppTest)"] = measure_app(args.repeat)
+    print(f"{'app 冷啟動 (AppTest)':<28} {app['ms']:>9.1f} ms  已載入選用套件: {', '.join(app['loaded']) or '無'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r in regressions: print(f"⚠️ 退步 {r}")
+        if regressions: return 1
+    if not app["ok"] or app["loaded"]:
+        print(f"⚠️ 第一次 render 就載入了 {', '.join(app['loaded'])}" if app["loaded"] else "⚠️ app 執行失敗")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""離線替身：取代 Gemini 與 Google Sheets，讓 benchmark 不需要網路與金鑰。"""
+import contextlib
+import json
+
+from trip_app import ai, deps, sync
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        # stream=True 時逐段回傳
+        for i in range(0, len(self.text), 20):
+            yield _Response(self.text[i:i + 20])
+
+
+_PHRASES = [
+    {"category": "👋 招呼", "zh": "你好", "local": "Xin chào", "roman": ""},
+    {"category": "🍜 點餐", "zh": "多少錢", "local": "Bao nhiêu tiền?", "roman": ""},
+    {"category": "🆘", "zh": "迷路", "local": "Tôi bị lạc", "roman": "", "sos": True},
+]
+
+
+class FakeModel:
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        schema = (generation_config or {}).get("response_schema")
+        if schema and schema["type"] == "array" and "zh" in schema["items"]["properties"]:
+            return _Response(json.dumps(_PHRASES, ensure_ascii=False))
+        if isinstance(prompt, list) or (schema and schema["type"] == "array"):
+            return _Response(json.dumps([{"name": "拉麵", "price": 980}, {"name": "餃子", "price": 450}], ensure_ascii=False))
+        if schema:
+            obj = {"title": "錦市場", "loc": "京都", "note": "京都的廚房", "lang": "vi"}
+            return _Response(json.dumps({k: obj[k] for k in schema["properties"]}, ensure_ascii=False))
+        return _Response("建議提早抵達，避開人潮；附近有不少在地小吃可以順路品嚐。" * 3)
+
+
+class _Cell:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeSheet:
+    def __init__(self):
+        self.cells = {}
+
+    def update_cell(self, row, col, value):
+        self.cells[(row, col)] = value
+
+    def cell(self, row, col):
+        return _Cell(self.cells.get((row, col)))
+
+
+class FakeClient:
+    def __init__(self):
+        self.sheet1 = FakeSheet()
+
+    def open(self, name):
+        return self
+
+
+@contextlib.contextmanager
+def offline():
+    """在 with 區塊內把 AI 與雲端都換成本地替身。"""
+    client = FakeClient()
+    saved = (ai.get_gemini_model, sync.get_cloud_connection, sync.CLOUD_AVAILABLE, deps.CLOUD_AVAILABLE)
+    ai.get_gemini_model = lambda api_key=None: FakeModel()
+    sync.get_cloud_connection = lambda service_account=None, keyfile=None: client
+    sync.CLOUD_AVAILABLE = deps.CLOUD_AVAILABLE = True
+    try:
+        yield client
+    finally:
+        ai.get_gemini_model, sync.get_cloud_connection, sync.CLOUD_AVAILABLE, deps.CLOUD_AVAILABLE = saved
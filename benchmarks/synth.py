@@ -0,0 +1,54 @@
+"""合成行程產生器：可指定天數、每天行程數、每個行程的花費筆數、願望/清單大小。"""
+import random
+
+from trip_app.model import SHOPPING_COLUMNS, Expense, TripItem, Wish, default_flight_info, default_hotel_info
+
+_PLACES = ["錦市場", "清水寺", "八坂神社", "伏見稻荷", "嵐山竹林", "金閣寺", "道頓堀", "大阪城", "黑門市場", "心齋橋", "梅田", "奈良公園"]
+_CATS = ["food", "trans", "spot", "stay", "other"]
+_GOODS = ["拉麵", "抹茶冰淇淋", "車票", "門票", "伴手禮", "咖啡", "章魚燒", "藥妝"]
+
+
+def generate_trip(days=5, items_per_day=6, expenses_per_item=2, wishlist_size=20, checklist_size=40, seed=0):
+    """回傳和 Streamlit session_state 相同形狀的 dict (trip_data / wishlist / checklist / shopping_list ...)。"""
+    rnd = random.Random(seed)
+    trip_data = {}
+    next_id = 1
+    for d in range(1, days + 1):
+        items = []
+        for i in range(items_per_day):
+            place = rnd.choice(_PLACES)
+            expenses = [Expense(rnd.choice(_GOODS), rnd.randint(100, 5000), f"2026-01-{d:02d}T12:00:00")
+                        for _ in range(expenses_per_item)]
+            minute = 8 * 60 + i * (14 * 60 // max(items_per_day, 1))
+            items.append(TripItem(
+                next_id, f"{minute // 60:02d}:{minute % 60:02d}", f"{place} {i + 1}", place,
+                rnd.randint(0, 3000) + sum(x.price for x in expenses), rnd.choice(_CATS), f"第 {d} 天的第 {i + 1} 站",
+                "🚶 步行", rnd.randint(5, 60), expenses
+            ))
+            next_id += 1
+        rnd.shuffle(items)
+        trip_data[d] = items
+
+    wishlist = [Wish(10_000 + i, f"{rnd.choice(_PLACES)} 願望 {i}", rnd.choice(_PLACES), "想去") for i in range(wishlist_size)]
+
+    checklist = {}
+    per_cat = 10
+    for i in range(checklist_size):
+        checklist.setdefault(f"分類 {i // per_cat + 1}", {})[f"物品 {i}"] = rnd.random() < 0.5
+
+    return {
+        "trip_data": trip_data,
+        "trip_days_count": days,
+        "wishlist": wishlist,
+        "checklist": checklist,
+        "flight_info": default_flight_info(),
+        "hotel_info": default_hotel_info(),
+        "shopping_rows": [dict(zip(SHOPPING_COLUMNS, [f"對象{i}", rnd.choice(_GOODS), rnd.randint(100, 9000), False]))
+                          for i in range(wishlist_size)],
+    }
+
+
+def trip_to_rows(trip_data):
+    """轉成 Excel 匯入格式的列 (Day / Time / Title / Location / Cost / Note)。"""
+    return [{"Day": d, "Time": it.time, "Title": it.title, "Location": it.loc, "Cost": it.cost, "Note": it.note}
+            for d, items in trip_data.items() for it in items]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from trip_app.forecast import BudgetLedger, project
+from trip_app.model import Expense, TripItem
+
+START = datetime(2026, 1, 17)
+
+
+def _forecast(trip, today=datetime(2026, 1, 17, 20, 0)):
+    ledger = BudgetLedger()
+    ledger.sync(trip)
+    return project(ledger, START, max(trip), today)
+
+
+def test_unbudgeted_spending_does_not_alert():
+    trip = {1: [TripItem(1, cost=3000, cat="food"), TripItem(2, cat="stay", expenses=[Expense("寄物", 300)])],
+            2: [TripItem(3, cost=3000, cat="food")]}
+    assert _forecast(trip).alerts == []
+
+
+def test_small_overspend_does_not_alert():
+    trip = {1: [TripItem(1, cost=3000, cat="food", expenses=[Expense("拉麵", 3400)])]}
+    assert _forecast(trip).alerts == []
+
+
+def test_real_overspend_alerts_trip_category_and_day():
+    trip = {1: [TripItem(1, cost=3000, cat="food", expenses=[Expense("燒肉", 9000)])],
+            2: [TripItem(2, cost=3000, cat="food")]}
+    fc = _forecast(trip)
+    assert fc.projected == 18000
+    assert len(fc.alerts) == 3
+    assert fc.alerts[-1].startswith("Day 1")
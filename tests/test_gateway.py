@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+from trip_app.gateway import BACKGROUND, INTERACTIVE, AIGateway
+
+
+def _gateway(**kwargs):
+    opts = {"max_concurrency": 2, "rate_per_min": 60000, "timeout": 2.0, "retries": 2, "backoff": 0.01}
+    return AIGateway(**{**opts, **kwargs})
+
+
+class Tracker:
+    """記錄同時執行中的呼叫數與執行順序。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.order = []
+
+    def job(self, name, seconds=0.05, result=None):
+        def fn():
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                self.order.append(name)
+            time.sleep(seconds)
+            with self.lock:
+                self.active -= 1
+            return result if result is not None else name
+        return fn
+
+
+def test_coalesces_same_key():
+    gw = _gateway()
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "ok"
+    a = gw.submit(fn, key="k")
+    b = gw.submit(fn, key="k")
+    assert a is b
+    release.set()
+    assert a.result(2) == "ok"
+    assert calls == [1]
+    # 完成後同一個 key 會重新送出
+    assert gw.submit(lambda: "again", key="k").result(2) == "again"
+
+
+def test_cancelled_promoted_job_does_not_kill_worker():
+    gw = _gateway(max_concurrency=1)
+    block = gw.submit(lambda: time.sleep(0.2))
+    bg = gw.submit(lambda: "bg", key="k", priority=BACKGROUND)
+    promoted = gw.submit(lambda: "bg", key="k", priority=INTERACTIVE)
+    assert promoted is bg
+    assert gw.cancel(bg) is False       # 還有另一個人在等
+    assert gw.cancel(bg) is True
+    block.result(2)
+    assert gw.submit(lambda: "after").result(2) == "after"
+
+
+def test_cancel_started_job_is_refused():
+    gw = _gateway()
+    started = threading.Event()
+    f = gw.submit(lambda: (started.set(), time.sleep(0.1), "done")[2])
+    started.wait(2)
+    assert gw.cancel(f) is False
+    assert f.result(2) == "done"
+
+
+def test_interactive_jumps_throttled_background_jobs():
+    # 每 0.1 秒一個 token；背景工作等 token 時不佔名額，互動式請求拿到下一個 token
+    gw = _gateway(max_concurrency=4, rate_per_min=600, burst=1)
+    t = Tracker()
+    futures = [gw.submit(t.job(f"bg{i}", 0.01), priority=BACKGROUND) for i in range(5)]
+    time.sleep(0.02)
+    futures.append(gw.submit(t.job("ui", 0.01), priority=INTERACTIVE))
+    for f in futures: f.result(5)
+    assert t.order.index("ui") <= 2
+
+
+def test_retries_retryable_errors():
+    gw = _gateway()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) < 3: raise RuntimeError("503 ServiceUnavailable")
+        return "ok"
+    assert gw.submit(fn).result(5) == "ok"
+    assert len(calls) == 3
+
+
+def test_does_not_retry_other_errors():
+    gw = _gateway()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise ValueError("bad request")
+    with pytest.raises(ValueError):
+        gw.submit(fn).result(2)
+    assert calls == [1]
+
+
+def test_timeout_waits_for_old_attempt_instead_of_overlapping():
+    gw = _gateway(max_concurrency=1, timeout=0.1, retries=1)
+    t = Tracker()
+    assert gw.submit(t.job("slow", 0.15, "late")).result(2) == "late"   # 晚到的成功結果直接用
+    assert t.order == ["slow"]
+    assert t.peak == 1
+
+
+def test_final_timeout_returns_promptly_and_keeps_slot():
+    gw = _gateway(max_concurrency=1, timeout=0.1, retries=0)
+    t = Tracker()
+    slow = gw.submit(t.job("slow", 0.4))
+    t0 = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        slow.result(2)
+    assert time.perf_counter() - t0 < 0.3
+    # 逾時的 thread 還在跑：下一個工作要等它結束才開始
+    assert gw.submit(t.job("next", 0.01)).result(2) == "next"
+    assert t.peak == 1
+
+
+def test_timeout_gives_up_when_old_attempt_never_finishes():
+    gw = _gateway(max_concurrency=1, timeout=0.05, retries=2)
+    t = Tracker()
+    with pytest.raises(TimeoutError):
+        gw.submit(t.job("stuck", 0.3)).result(2)
+    assert t.order == ["stuck"]         # 沒有在舊的還在跑時送出第二份
+
+
+def test_concurrency_cap():
+    gw = _gateway(max_concurrency=2)
+    t = Tracker()
+    futures = [gw.submit(t.job(i, 0.05)) for i in range(8)]
+    assert sorted(f.result(5) for f in futures) == list(range(8))
+    assert t.peak == 2
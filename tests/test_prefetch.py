@@ -0,0 +1,27 @@
+import threading
+
+from trip_app import gateway, prefetch
+
+
+def test_cancel_all_keeps_running_prefetches(monkeypatch):
+    gw = gateway.AIGateway(max_concurrency=1, rate_per_min=60000)
+    monkeypatch.setattr(gateway, "get_gateway", lambda: gw)
+    release = threading.Event()
+    started = threading.Event()
+
+    def running():
+        started.set()
+        release.wait(2)
+        return "已開始的建議"
+    p = prefetch.AdvicePrefetcher("key", "日本")
+    p.pending = {"a": gw.submit(running, priority=gateway.BACKGROUND),
+                 "b": gw.submit(lambda: "排隊中", priority=gateway.BACKGROUND)}
+    started.wait(2)
+    p.cancel_all()
+    assert list(p.pending) == ["a"]
+    release.set()
+    p.pending["a"].result(2)
+    cache = {}
+    p.collect(cache)
+    assert cache == {"a": "已開始的建議"}
+    assert p.pending == {}
@@ -0,0 +1,46 @@
+from trip_app.search import SearchIndex, tokenize
+
+
+def _index():
+    index = SearchIndex()
+    index.sync("check", {
+        1: ("SIM卡 / Wifi機 電子", {"title": "SIM卡 / Wifi機"}),
+        2: ("JR京都駅 交通", {"title": "JR京都駅"}),
+        3: ("% Arabica 咖啡 嵐山", {"title": "% Arabica"}),
+        4: ("USJ環球影城 大阪", {"title": "USJ環球影城"}),
+    })
+    return index
+
+
+def _hits(index, q):
+    return [d[1] for _, d, _, _ in index.query(q)]
+
+
+def test_mixed_latin_cjk_is_split():
+    assert tokenize("JR京都駅")[:3] == ["jr", "京都", "都駅"]
+    index = _index()
+    assert _hits(index, "京都") == [2]
+    assert _hits(index, "環球影城") == [4]
+    assert _hits(index, "usj") == [4]
+    assert _hits(index, "卡") == [1]
+
+
+def test_single_word_typo_is_found():
+    index = _index()
+    assert _hits(index, "wify") == [1]       # 4 個字母打錯 1 個
+    assert _hits(index, "arabika") == [3]
+    assert _hits(index, "wifi")[0] == 1
+    assert index.query("wifi")[0][0] > index.query("wify")[0][0]   # 完全命中排在模糊命中前面
+
+
+def test_unrelated_query_finds_nothing():
+    assert _hits(_index(), "tokyo") == []
+
+
+def test_sync_removes_and_reindexes():
+    index = _index()
+    index.sync("check", {2: ("JR大阪駅", {"title": "JR大阪駅"})})
+    assert len(index) == 1
+    assert _hits(index, "京都") == []
+    assert _hits(index, "大阪") == [2]
+    assert _hits(index, "wifi") == []
@@ -0,0 +1,12 @@
+"""旅程規劃核心：資料模型、記帳、匯入、雲端同步與 AI，不依賴 Streamlit。
+
+Streamlit 介面 (ai_studio_code (21) (1).py) 與 HTTP API (trip_app.api) 都建立在這個套件之上。
+"""
+from .ledger import add_expense, add_expenses, day_totals
+from .model import Expense, Flight, Hotel, TripItem, Wish, build_timeline, ensure_days, find_item, new_item
+
+__all__ = [
+    "add_expense", "add_expenses", "day_totals",
+    "Expense", "Flight", "Hotel", "TripItem", "Wish",
+    "build_timeline", "ensure_days", "find_item", "new_item",
+]
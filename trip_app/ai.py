@@ -0,0 +1,204 @@
+"""Gemini 介面：行程建議、願望清單解析、收據辨識。api_key 由呼叫端傳入，所有請求都經過 gateway 排隊。"""
+import hashlib
+import io
+
+from . import gateway, matching, metrics, structured
+from .deps import GEMINI_AVAILABLE, get_genai, get_pil_image
+
+PRIORITY_MODELS = [
+    'gemini-2.0-flash', 'gemini-2.5-flash', 'gemini-2.5-pro',
+    'gemini-2.0-flash-lite', 'gemini-1.5-flash', 'gemini-pro'
+]
+
+_models = {}  # api_key -> GenerativeModel，避免每次呼叫都重新 configure
+
+
+def get_gemini_model(api_key):
+    if not GEMINI_AVAILABLE: return None
+    if not api_key: return None
+    model = _models.get(api_key)
+    metrics.cache_lookup("gemini_model", model is not None)
+    if model is not None: return model
+    try:
+        genai = get_genai()
+        genai.configure(api_key=api_key)
+        model = _models[api_key] = genai.GenerativeModel(PRIORITY_MODELS[0])
+        return model
+    except Exception as e:
+        print(f"Model Init Error: {e}")
+        return None
+
+
+def _read_bytes(file):
+    if hasattr(file, "getvalue"): return file.getvalue()
+    if hasattr(file, "seek"): file.seek(0)
+    return file.read()
+
+
+def _submit(model, api_key, contents, fn, digest, priority, schema=None):
+    """把 model.generate_content 排進 gateway，回傳 Future；相同 (fn, digest) 的進行中請求會共用結果。
+
+    有 schema 時以 JSON 模式 (response_mime_type + response_schema) 要求結構化輸出。
+    """
+    config = schema.generation_config() if schema else None
+    gw = gateway.get_gateway()
+    # 逾時交給 SDK 自己中斷連線；gateway 那邊的逾時停不下已經在 thread 裡跑的呼叫
+    options = {"timeout": gw.timeout}
+    def job():
+        if config: response = model.generate_content(contents, generation_config=config, request_options=options)
+        else: response = model.generate_content(contents, request_options=options)
+        metrics.record_usage(response, fn)
+        return response.text
+    key = (fn, getattr(model, "model_name", None), digest)
+    return gw.submit(job, key=key, bucket_key=api_key, priority=priority)
+
+
+def _generate(model, api_key, contents, fn, digest, priority, schema=None):
+    return _submit(model, api_key, contents, fn, digest, priority, schema).result()
+
+
+estimate_tokens = structured.estimate_tokens
+
+
+# 建議約 100 字，回覆大約佔用的 token 數
+ADVICE_OUTPUT_TOKENS = 200
+# get_ai_step_advice_stream 失敗時回傳的訊息開頭，這類結果不該放進快取
+ADVICE_ERROR_PREFIXES = ("⚠️", "連線錯誤")
+
+
+def _advice_prompt(item, country):
+    return f"在{country}旅遊，現在在「{item.title}」(地點：{item.loc}，備註：{item.note})。給約 100 字建議(注意事項、看點或美食)。"
+
+
+def advice_cache_key(item, country):
+    """同一個行程內容 + 地區才共用建議；標題、地點或備註改了就視為新的。"""
+    return _digest(country, item.title, item.loc, item.note)
+
+
+def estimate_advice_tokens(item, country):
+    return estimate_tokens(_advice_prompt(item, country)) + ADVICE_OUTPUT_TOKENS
+
+
+def submit_step_advice(item, country, api_key, priority=gateway.BACKGROUND):
+    """非同步產生建議 (預先載入用)，回傳 Future；AI 未啟用時回傳 None。"""
+    model = get_gemini_model(api_key)
+    if not model: return None
+    prompt = _advice_prompt(item, country)
+    return _submit(model, api_key, prompt, "advice", _digest(prompt), priority)
+
+
+def _digest(*parts):
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode("utf-8"))
+    return h.hexdigest()
+
+
+@metrics.timed("gemini_call", fn="advice")
+def get_ai_step_advice_stream(item, country, api_key, priority=gateway.INTERACTIVE):
+    model = get_gemini_model(api_key)
+    if not model:
+        yield "⚠️ AI 未啟用 (請設定 API Key)"
+        return
+    try:
+        prompt = _advice_prompt(item, country)
+        text = _generate(model, api_key, prompt, "advice", _digest(prompt), priority)
+        if text: yield text
+    except Exception as e:
+        metrics.inc("ai_errors", fn="advice")
+        err_msg = str(e)
+        if "404" in err_msg: yield "⚠️ 錯誤 404：找不到模型。"
+        else: yield f"連線錯誤: {err_msg}"
+
+
+@metrics.timed("gemini_call", fn="wishlist")
+def parse_wishlist_text(raw_text, api_key, priority=gateway.INTERACTIVE):
+    """回傳 {"title", "loc", "note"}；連修補後仍缺 title 時回傳 None。"""
+    model = get_gemini_model(api_key)
+    if not model: return None
+    try:
+        prompt = structured.WISH_PROMPT.format(text=raw_text)
+        text = _generate(model, api_key, prompt, "wishlist", _digest(prompt), priority, structured.WISH)
+        wish, bad = structured.validate_object(structured.loads(text), structured.WISH)
+        if bad:
+            # 只重問失敗的欄位
+            metrics.inc("ai_repairs", fn="wishlist")
+            schema = structured.WISH.subset(bad)
+            prompt = structured.WISH_REPAIR_PROMPT.format(fields="、".join(bad), text=raw_text)
+            text = _generate(model, api_key, prompt, "wishlist", _digest(prompt), priority, schema)
+            fixed, bad = structured.validate_object(structured.loads(text), schema)
+            wish.update(fixed)
+        if bad:
+            metrics.inc("ai_schema_failures", fn="wishlist")
+            return None
+        return wish
+    except Exception as e:
+        metrics.inc("ai_errors", fn="wishlist")
+        print(f"Wishlist Parse Error: {e}")
+        return None
+
+
+@metrics.timed("gemini_call", fn="phrases")
+def generate_phrase_pack(country, api_key, lang=None, priority=gateway.INTERACTIVE):
+    """回傳 {"lang", "rows": [{"category", "zh", "local", "roman", "sos"}, ...]}；沒給 lang 時另外問語言代碼。失敗回傳 None。"""
+    model = get_gemini_model(api_key)
+    if not model: return None
+    try:
+        prompt = structured.PHRASES_PROMPT.format(country=country)
+        text = _generate(model, api_key, prompt, "phrases", _digest(prompt), priority, structured.PHRASES)
+        rows, bad = structured.validate_list(structured.loads(text), structured.PHRASES)
+        if bad: metrics.inc("ai_dropped_rows", len(bad), fn="phrases")
+        if not lang:
+            prompt = structured.LANG_PROMPT.format(country=country)
+            text = _generate(model, api_key, prompt, "phrases", _digest(prompt), priority, structured.LANG)
+            res, _ = structured.validate_object(structured.loads(text), structured.LANG)
+            lang = res.get('lang', '').lower()
+        if not rows or not lang:
+            metrics.inc("ai_schema_failures", fn="phrases")
+            return None
+        return {"lang": lang, "rows": rows}
+    except Exception as e:
+        metrics.inc("ai_errors", fn="phrases")
+        print(f"Phrase Pack Error: {e}")
+        return None
+
+
+@metrics.timed("gemini_call", fn="receipt")
+def analyze_receipt_image(image_file, api_key, priority=gateway.INTERACTIVE):
+    """回傳 [{"name", "price", "store"}, ...]；失敗時回傳 [{"name": "分析失敗", "price": 0}]。"""
+    model = get_gemini_model(api_key)
+    default_res = [{"name": "分析失敗", "price": 0}]
+    if not model: return [{"name": "模擬商品(無AI)", "price": 100}]
+    try:
+        data = _read_bytes(image_file)
+        img = get_pil_image().open(io.BytesIO(data))
+        prompt = structured.RECEIPT_PROMPT
+        text = _generate(model, api_key, [prompt, img], "receipt", _digest(prompt, data), priority, structured.RECEIPT_ITEMS)
+        items, bad = structured.validate_list(structured.loads(text), structured.RECEIPT_ITEMS)
+        if items is None:
+            # 整份都不是 JSON：用同一個 prompt 完整再問一次
+            metrics.inc("ai_repairs", fn="receipt")
+            text = _generate(model, api_key, [prompt, img], "receipt", _digest(prompt, data, "retry"), priority, structured.RECEIPT_ITEMS)
+            items, bad = structured.validate_list(structured.loads(text), structured.RECEIPT_ITEMS)
+        elif bad:
+            # 只針對金額或名稱有問題的品項再問一次
+            metrics.inc("ai_repairs", fn="receipt")
+            names = "、".join(str(b.get('name') or b.get('price') or '?') for b in bad if isinstance(b, dict))
+            repair = structured.RECEIPT_REPAIR_PROMPT.format(names=names)
+            text = _generate(model, api_key, [repair, img], "receipt", _digest(repair, data), priority, structured.RECEIPT_ITEMS)
+            fixed, bad = structured.validate_list(structured.loads(text), structured.RECEIPT_ITEMS)
+            # 模型常把整張收據重列一次：只補上原本沒有的品名
+            seen = {matching.normalize_name(x['name']) for x in items}
+            for x in fixed or []:
+                name = matching.normalize_name(x['name'])
+                if name not in seen:
+                    seen.add(name)
+                    items.append(x)
+        if not items:
+            metrics.inc("ai_schema_failures", fn="receipt")
+            return default_res
+        return items
+    except Exception as e:
+        metrics.inc("ai_errors", fn="receipt")
+        print(f"OCR Error: {e}")
+        return default_res
@@ -0,0 +1,155 @@
+"""HTTP/JSON API，直接呼叫核心 (不經過 Streamlit)，給批次工作與壓力測試使用。
+
+    pip install -r requirements-api.txt
+    uvicorn trip_app.api:app --workers 4
+
+所有端點都是無狀態的：行程資料隨請求送上來，結果直接回傳。
+請求裡的行程、願望都是 dict (欄位同 trip_app.model 的 dataclass)，缺少的欄位用預設值。
+"""
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from . import ai, codec, config, forecast, gateway, importers, matching, metrics, sync
+from .ledger import day_totals
+from .model import build_timeline
+
+app = FastAPI(title="Trip Planner API")
+
+
+class TripBody(BaseModel):
+    trip: Dict[str, List[Dict[str, Any]]]
+
+
+class AdviceBody(BaseModel):
+    item: Dict[str, Any]
+    country: str = "日本"
+
+
+class WishlistBody(BaseModel):
+    text: str
+
+
+class MatchBody(BaseModel):
+    trip: Dict[str, List[Dict[str, Any]]]
+    lines: List[Dict[str, Any]]
+    start_date: datetime
+    now: Optional[datetime] = None      # 旅客的當地時間；帶時區時只取當地時間 (不換算)
+    place: Optional[str] = None
+
+
+class StateBody(BaseModel):
+    trip: Dict[str, List[Dict[str, Any]]]
+    wish: List[Dict[str, Any]] = []
+    check: Dict[str, Dict[str, bool]] = {}
+
+
+def _local(dt):
+    """帶時區的時間 → 當地時間 (naive)；花費的 ts 都存當地時間，不能和 aware 的 datetime 相減。"""
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo is not None else dt
+
+
+def _trip_data(trip):
+    try:
+        return codec.trip_from_dicts(trip)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"trip 格式錯誤：{e}")
+
+
+@app.get("/health")
+def health():
+    return {"ok": True}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_text():
+    return PlainTextResponse(metrics.render_openmetrics(), media_type="application/openmetrics-text; version=1.0.0; charset=utf-8")
+
+
+@app.post("/timeline")
+def timeline(body: TripBody):
+    return [{"day_num": day, **asdict(item)} for day, item in build_timeline(_trip_data(body.trip))]
+
+
+@app.post("/budget")
+def budget(body: TripBody, day: Optional[int] = None):
+    trip_data = _trip_data(body.trip)
+    days = [day] if day is not None else sorted(trip_data)
+    result = {}
+    for d in days:
+        planned, actual = day_totals(trip_data.get(d, []))
+        result[d] = {"planned": planned, "actual": actual}
+    return result
+
+
+@app.post("/budget/forecast")
+def budget_forecast(body: TripBody, start_date: datetime, today: Optional[datetime] = None):
+    """依目前的花費推估整趟總支出，並列出超支提醒。"""
+    trip_data = _trip_data(body.trip)
+    ledger = forecast.BudgetLedger()
+    ledger.sync(trip_data)
+    return forecast.project(ledger, _local(start_date), max(trip_data, default=0), _local(today))
+
+
+@app.post("/expenses/match")
+def match_expenses(body: MatchBody):
+    """收據是否已記錄過，以及最可能屬於哪個行程。"""
+    trip_data = _trip_data(body.trip)
+    index = matching.ExpenseIndex()
+    index.ensure(trip_data)
+    now = _local(body.now)
+    dup = index.find_receipt(matching.receipt_fingerprint(body.lines), now)
+    place = body.place or next((x['store'] for x in body.lines if x.get('store')), None)
+    sug = matching.suggest_item(trip_data, _local(body.start_date), now, [x.get('name', '') for x in body.lines], place)
+    return {
+        "duplicate": {"day": dup[0], "item_id": dup[1].id} if dup else None,
+        "suggestion": {"day": sug[0], "item_id": sug[1].id, "score": round(sug[2], 3)} if sug else None,
+    }
+
+
+@app.post("/import/excel")
+def import_excel(file: UploadFile = File(...)):
+    try:
+        return importers.parse_excel(file.file)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"匯入失敗：{e}")
+
+
+@app.post("/ai/advice")
+def advice(body: AdviceBody):
+    text = "".join(ai.get_ai_step_advice_stream(codec.item_from_dict(body.item), body.country, config.gemini_api_key()))
+    return {"text": text}
+
+
+@app.post("/ai/wishlist")
+def wishlist(body: WishlistBody):
+    res = ai.parse_wishlist_text(body.text, config.gemini_api_key(), priority=gateway.BACKGROUND)
+    if not res or 'title' not in res:
+        raise HTTPException(status_code=502, detail="解析失敗")
+    return res
+
+
+@app.post("/ai/receipt")
+def receipt(file: UploadFile = File(...)):
+    return ai.analyze_receipt_image(file.file, config.gemini_api_key(), priority=gateway.BACKGROUND)
+
+
+@app.post("/sync/save")
+def sync_save(body: StateBody):
+    wish = [codec.wish_from_dict(w) for w in body.wish]
+    ok, msg = sync.save_to_cloud(sync.dump_state(_trip_data(body.trip), wish, body.check), config.gcp_service_account())
+    if not ok:
+        raise HTTPException(status_code=502, detail=msg)
+    return {"message": msg}
+
+
+@app.get("/sync/load")
+def sync_load():
+    raw = sync.load_from_cloud(config.gcp_service_account())
+    if not raw:
+        raise HTTPException(status_code=404, detail="雲端沒有資料")
+    return sync.load_state(raw)
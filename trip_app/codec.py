@@ -0,0 +1,116 @@
+"""序列化：schema 版本、緊湊編碼與舊資料遷移 (雲端同步與 HTTP API 共用)。
+
+v1 (沒有 "v" 欄位)：每個物件都是 dict，key 不齊 (Excel 匯入的行程沒有 cat / trans_mode，早期的花費沒有 ts)。
+v2：{"v": 2, "trip": {"1": [[id, time, title, ...], ...]}, ...}；物件存成依 dataclass 欄位順序的陣列，
+    不重複寫 key，JSON 大約小一半 (Sheets 單格上限 5 萬字)。有裝 orjson 就用 orjson，否則退回標準 json。
+"""
+import json
+from dataclasses import fields
+from operator import attrgetter
+
+from .deps import ORJSON_AVAILABLE, get_orjson
+from .model import Expense, Flight, Hotel, TripItem, Wish, new_item_id
+
+SCHEMA_VERSION = 2
+
+
+def _names(cls):
+    return tuple(f.name for f in fields(cls))
+
+
+# TripItem 的 expenses 是最後一個欄位，另外逐筆編碼
+_row_item = attrgetter(*_names(TripItem)[:-1])
+_row_expense = attrgetter(*_names(Expense))
+_row_wish = attrgetter(*_names(Wish))
+_row_hotel = attrgetter(*_names(Hotel))
+_row_flight = attrgetter(*_names(Flight))
+
+
+# -------------------------------------
+# JSON
+# -------------------------------------
+def dumps(data):
+    if ORJSON_AVAILABLE: return get_orjson().dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def loads(raw):
+    return get_orjson().loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+
+# -------------------------------------
+# 編碼 / 解碼 (目前版本)
+# -------------------------------------
+def encode(trip_data, wishlist=None, checklist=None, hotel_info=None, flight_info=None):
+    """session 資料 → 可直接 dumps 的 v2 結構；沒給的部分不寫入。"""
+    data = {"v": SCHEMA_VERSION,
+            "trip": {str(d): [(*_row_item(it), [_row_expense(x) for x in it.expenses]) for it in items]
+                     for d, items in trip_data.items()}}
+    if wishlist is not None: data['wish'] = [_row_wish(w) for w in wishlist]
+    if checklist is not None: data['check'] = checklist
+    if hotel_info is not None: data['hotel'] = [_row_hotel(h) for h in hotel_info]
+    if flight_info is not None: data['flight'] = {k: _row_flight(f) for k, f in flight_info.items()}
+    return data
+
+
+def decode(data):
+    """loads 的結果 → {"trip": {int: [TripItem]}, "wish": [Wish], "check", "hotel", "flight"}；舊版本自動遷移。"""
+    version = data.get("v", 1)
+    if version > SCHEMA_VERSION: raise ValueError(f"不支援的資料版本 v{version}")
+    if version == 1: return migrate_v1(data)
+    out = {"trip": {int(d): [TripItem(*row[:-1], [Expense(*x) for x in row[-1]]) for row in items]
+                    for d, items in data['trip'].items()}}
+    if "wish" in data: out['wish'] = [Wish(*row) for row in data['wish']]
+    if "check" in data: out['check'] = data['check']
+    if "hotel" in data: out['hotel'] = [Hotel(*row) for row in data['hotel']]
+    if "flight" in data: out['flight'] = {k: Flight(*row) for k, row in data['flight'].items()}
+    return out
+
+
+# -------------------------------------
+# dict → 物件 (v1 遷移、API 的請求內容)
+# -------------------------------------
+def _from_dict(cls, d, **extra):
+    """只取 dataclass 有的欄位；缺少或 None 的用預設值，數字 / 文字欄位順便轉型。"""
+    kw = {}
+    for f in fields(cls):
+        v = d.get(f.name)
+        if v is None or f.name in extra: continue
+        kw[f.name] = f.type(v) if f.type in (int, str) else v
+    return cls(**kw, **extra)
+
+
+def expense_from_dict(d):
+    return _from_dict(Expense, d)
+
+
+def item_from_dict(d):
+    extra = {"expenses": [expense_from_dict(x) for x in d.get('expenses') or []]}
+    if d.get('id') is None: extra['id'] = new_item_id()
+    return _from_dict(TripItem, d, **extra)
+
+
+def wish_from_dict(d):
+    return _from_dict(Wish, d)
+
+
+def hotel_from_dict(d):
+    return _from_dict(Hotel, d)
+
+
+def flight_from_dict(d):
+    return _from_dict(Flight, d)
+
+
+def trip_from_dicts(trip):
+    """{"1": [dict, ...]} → {1: [TripItem, ...]}；JSON 的 key 一定是字串，這裡轉回 int 天數。"""
+    return {int(d): [item_from_dict(x) for x in items] for d, items in trip.items()}
+
+
+def migrate_v1(data):
+    out = {"trip": trip_from_dicts(data.get('trip') or {})}
+    if "wish" in data: out['wish'] = [wish_from_dict(w) for w in data['wish']]
+    if "check" in data: out['check'] = data['check']
+    if "hotel" in data: out['hotel'] = [hotel_from_dict(h) for h in data['hotel']]
+    if "flight" in data: out['flight'] = {k: flight_from_dict(f) for k, f in data['flight'].items()}
+    return out
@@ -0,0 +1,16 @@
+"""非 Streamlit 環境 (API、批次工作) 的金鑰設定：從環境變數讀取。"""
+import json
+import os
+
+
+def gemini_api_key():
+    return os.environ.get("GEMINI_API_KEY")
+
+
+def gcp_service_account():
+    """GCP_SERVICE_ACCOUNT 可以是 JSON 字串或 JSON 檔路徑；沒設定時回傳 None (改用 secrets.json)。"""
+    raw = os.environ.get("GCP_SERVICE_ACCOUNT")
+    if not raw: return None
+    if raw.lstrip().startswith("{"): return json.loads(raw)
+    with open(raw, encoding="utf-8") as f:
+        return json.load(f)
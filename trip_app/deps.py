@@ -0,0 +1,31 @@
+"""選用套件：只用 find_spec 檢查是否存在，真正用到時才匯入 (加快冷啟動)。"""
+import functools
+import importlib
+import importlib.util
+
+
+def has_module(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+CLOUD_AVAILABLE = has_module("gspread") and has_module("oauth2client")
+GEMINI_AVAILABLE = has_module("google.generativeai") and has_module("PIL")
+ORJSON_AVAILABLE = has_module("orjson")
+TTS_AVAILABLE = has_module("gtts")
+
+
+@functools.lru_cache(maxsize=None)
+def lazy_import(name):
+    return importlib.import_module(name)
+
+
+def get_pandas(): return lazy_import("pandas")
+def get_gspread(): return lazy_import("gspread")
+def get_credentials_cls(): return lazy_import("oauth2client.service_account").ServiceAccountCredentials
+def get_genai(): return lazy_import("google.generativeai")
+def get_pil_image(): return lazy_import("PIL.Image")
+def get_orjson(): return lazy_import("orjson")
+def get_tts_cls(): return lazy_import("gtts").gTTS
@@ -0,0 +1,149 @@
+"""預算預測：依分類 (cat) 的花費速度推估整趟旅程的總支出，並在某天或某分類超支時提醒。
+
+BudgetLedger 把 (天, 分類) 的預算與支出維持成彙總表；每次 rerun 的 sync 只比對每個項目的
+天 / 分類 / 預算 / 花費筆數，花費只會往後加，所以只加總新的那幾筆，不重掃所有 expenses。
+"""
+import collections
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+CATS = {"food": "🍜 餐飲", "trans": "🚆 交通", "spot": "🎡 景點", "stay": "🏨 住宿", "other": "📦 其他"}
+
+# 預計超過預算這個比例、而且至少超出 ALERT_MIN_OVER 才提醒 (避免幾百塊的誤差一直跳警告)；
+# 沒編預算的分類 / 天數 (預設行程的交通、住宿是 0) 不提醒
+ALERT_RATIO = 1.1
+ALERT_MIN_OVER = 1000
+
+
+def _cat(cat):
+    return cat if cat in CATS else "other"
+
+
+class BudgetLedger:
+    def __init__(self):
+        self.source = None
+        self._items = {}                                  # id(item) -> [item, day, cat, cost, actual, n_expenses]
+        self.planned = collections.defaultdict(int)       # (day, cat) -> 預算
+        self.actual = collections.defaultdict(int)        # (day, cat) -> 支出
+        self.count = collections.defaultdict(int)         # (day, cat) -> 行程數
+
+    def _apply(self, rec, sign):
+        _, day, cat, cost, actual, _ = rec
+        self.planned[day, cat] += sign * cost
+        self.actual[day, cat] += sign * actual
+        self.count[day, cat] += sign
+
+    def sync(self, trip_data):
+        """每次 rerun 呼叫；回傳有變動的項目數。trip_data 整份換掉 (匯入 / 下載) 時才全部重建。"""
+        if self.source is not trip_data:
+            self._items.clear()
+            self.planned.clear()
+            self.actual.clear()
+            self.count.clear()
+            self.source = trip_data
+        changed = 0
+        seen = set()
+        for day, items in trip_data.items():
+            for item in items:
+                key = id(item)
+                seen.add(key)
+                rec = self._items.get(key)
+                n = len(item.expenses)
+                cat = _cat(item.cat)
+                if rec and rec[1] == day and rec[2] == cat and rec[3] == item.cost and rec[5] == n: continue
+                if rec and rec[1] == day and rec[2] == cat and rec[5] <= n:
+                    # 只有新增花費 / 改預算：補上差額
+                    added = sum(x.price for x in item.expenses[rec[5]:])
+                    self.planned[day, cat] += item.cost - rec[3]
+                    self.actual[day, cat] += added
+                    rec[3], rec[4], rec[5] = item.cost, rec[4] + added, n
+                else:
+                    if rec: self._apply(rec, -1)
+                    rec = self._items[key] = [item, day, cat, item.cost, item.actual, n]
+                    self._apply(rec, 1)
+                changed += 1
+        for key in self._items.keys() - seen:
+            self._apply(self._items.pop(key), -1)
+            changed += 1
+        return changed
+
+    def day_totals(self, day):
+        return (sum(v for (d, _), v in self.planned.items() if d == day),
+                sum(v for (d, _), v in self.actual.items() if d == day))
+
+
+# -------------------------------------
+# 推估
+# -------------------------------------
+@dataclass(slots=True)
+class CatForecast:
+    cat: str
+    planned: int
+    spent: int
+    per_day: int        # 已過天數的平均每日花費
+    projected: int
+
+
+@dataclass(slots=True)
+class Forecast:
+    elapsed: int        # 已過 (含今天) 的旅程天數
+    days: int
+    planned: int
+    spent: int
+    projected: int
+    cats: list = field(default_factory=list)
+    alerts: list = field(default_factory=list)
+
+
+def _over_budget(amount, planned):
+    return planned > 0 and amount > planned * ALERT_RATIO and amount - planned >= ALERT_MIN_OVER
+
+
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+def trip_day(start_date, today=None):
+    """今天是旅程的第幾天 (出發前為 0 或負數)。"""
+    today = _as_date(today or datetime.now())
+    return (today - _as_date(start_date)).days + 1 if isinstance(start_date, date) else 0
+
+
+def project(ledger, start_date, days_count, today=None):
+    """每個分類：有預算的依已過天數「實際 / 預算」的比例推估剩下的預算；
+    沒有預算的依已過行程的平均花費乘上剩下的同類行程數 (一次性的交通費不會被當成每天都花)。
+    """
+    days = max([days_count] + [d for d, _ in ledger.planned] + [d for d, _ in ledger.actual])
+    elapsed = min(max(trip_day(start_date, today), 0), days)
+    cats = []
+    for cat in CATS:
+        planned = sum(v for (d, c), v in ledger.planned.items() if c == cat)
+        spent = sum(v for (d, c), v in ledger.actual.items() if c == cat)
+        if not planned and not spent: continue
+        planned_past = sum(v for (d, c), v in ledger.planned.items() if c == cat and d <= elapsed)
+        spent_past = sum(v for (d, c), v in ledger.actual.items() if c == cat and d <= elapsed)
+        per_day = spent_past // elapsed if elapsed else 0
+        prepaid = spent - spent_past   # 未來天數已經先記的花費
+        if not elapsed or not spent_past:
+            # 還沒有可比較的紀錄：照預算
+            projected = max(planned, spent)
+        elif planned:
+            pace = spent_past / planned_past if planned_past else 1
+            projected = spent + max(round((planned - planned_past) * pace) - prepaid, 0)
+        else:
+            past = sum(n for (d, c), n in ledger.count.items() if c == cat and d <= elapsed)
+            future = sum(n for (d, c), n in ledger.count.items() if c == cat and d > elapsed)
+            projected = spent + max(spent_past * future // max(past, 1) - prepaid, 0)
+        cats.append(CatForecast(cat, planned, spent, per_day, projected))
+
+    fc = Forecast(elapsed, days, sum(c.planned for c in cats), sum(c.spent for c in cats), sum(c.projected for c in cats), cats)
+    if _over_budget(fc.projected, fc.planned):
+        fc.alerts.append(f"整趟預計支出 ¥{fc.projected:,}，超出預算 ¥{fc.projected - fc.planned:,}")
+    for c in cats:
+        if _over_budget(c.projected, c.planned):
+            fc.alerts.append(f"{CATS[c.cat]} 預計 ¥{c.projected:,} (+{(c.projected - c.planned) * 100 // c.planned}%)")
+    for d in range(1, elapsed + 1):
+        planned, spent = ledger.day_totals(d)
+        if _over_budget(spent, planned):
+            fc.alerts.append(f"Day {d} 已花 ¥{spent:,}，超出當天預算 ¥{spent - planned:,}")
+    return fc
@@ -0,0 +1,255 @@
+"""AI 呼叫閘道：所有 Gemini 請求都經過這裡排隊。
+
+- 每把 API key 一個 token bucket (每分鐘請求數上限)
+- 全域併發上限；名額與 token 都由 dispatcher 依優先權發給排隊中的工作，等 token 時不佔名額
+- 單次逾時 + 指數退避重試 (只重試 429 / 5xx / 逾時)；逾時的呼叫跑完前不重試，也繼續佔用併發名額
+- 相同請求進行中時直接共用同一個結果 (single-flight)
+- 優先佇列：互動式請求 (INTERACTIVE) 先於背景工作 (BACKGROUND)
+
+asyncio event loop 跑在獨立的 daemon 執行緒，Streamlit 與 FastAPI 的同步程式碼透過 submit() 拿到
+concurrent.futures.Future。實際的 Gemini SDK 呼叫是同步的，放在 thread pool 中執行。
+"""
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+
+from . import metrics
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_RETRYABLE = ("429", "500", "502", "503", "504", "ResourceExhausted", "ServiceUnavailable",
+              "DeadlineExceeded", "InternalServerError", "TooManyRequests")
+
+
+def is_retryable(exc):
+    if isinstance(exc, TimeoutError): return True
+    text = f"{type(exc).__name__} {exc}"
+    return any(code in text for code in _RETRYABLE)
+
+
+class TokenBucket:
+    """rate：每秒補充的 token 數；capacity：可累積的突發量。只在 gateway 的 event loop 內使用。"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """還要等幾秒才有 token (0 表示現在就有)；不會拿走 token。"""
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ("fn", "future", "bucket_key", "timeout", "priority", "enqueued", "started", "running", "attempt",
+                 "waiters", "key")
+
+    def __init__(self, fn, future, bucket_key, timeout, priority, key):
+        self.fn = fn
+        self.future = future
+        self.bucket_key = bucket_key
+        self.timeout = timeout
+        self.priority = priority
+        self.key = key
+        self.enqueued = time.perf_counter()
+        self.started = False    # 第一次被派出去之後就不能取消 / 升級
+        self.running = False    # 目前這次嘗試已經派出去 (佇列裡同一次嘗試的其他副本直接略過)
+        self.attempt = 0
+        self.waiters = 1
+
+
+class AIGateway:
+    def __init__(self, max_concurrency=4, rate_per_min=60, burst=None, timeout=30.0, retries=2,
+                 backoff=0.5, backoff_max=8.0):
+        self.max_concurrency = max_concurrency
+        self.rate_per_min = rate_per_min
+        self.burst = burst or max(1, max_concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._inflight = {}     # key -> _Job
+        self._jobs = {}         # future -> _Job
+        self._buckets = {}
+        self._seq = 0
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._wakeup = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ai-call")
+
+    # -------------------------------------
+    # 同步端 (任何執行緒都可呼叫)
+    # -------------------------------------
+    def submit(self, fn, key=None, bucket_key=None, priority=INTERACTIVE, timeout=None):
+        """排入一個同步呼叫 fn()；key 相同且仍在進行中的請求會共用同一個 Future。"""
+        self._ensure_started()
+        with self._lock:
+            job = self._inflight.get(key) if key is not None else None
+            if job is not None and not job.future.done():
+                metrics.inc("gateway_coalesced")
+                job.waiters += 1
+                if priority < job.priority and not job.started:
+                    # 互動式請求搭上排隊中的背景工作：用較高優先權再排一次，先被取出的那份才會執行
+                    job.priority = priority
+                    self._enqueue(job)
+                return job.future
+            future = concurrent.futures.Future()
+            job = _Job(fn, future, bucket_key, timeout or self.timeout, priority, key)
+            self._jobs[future] = job
+            if key is not None: self._inflight[key] = job
+            self._enqueue(job)
+        future.add_done_callback(self._forget)
+        return future
+
+    def cancel(self, future):
+        """放棄等待；只有在沒有其他人共用、而且尚未開始執行時才會真的取消。"""
+        with self._lock:
+            job = self._jobs.get(future)
+            if job is None: return False
+            job.waiters -= 1
+            if job.waiters > 0 or job.started: return False
+        return future.cancel()
+
+    def _enqueue(self, job, delay=0):
+        """呼叫端要持有 self._lock。"""
+        self._seq += 1
+        entry = (job.priority, self._seq, job.attempt, job)
+        if delay: self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._put, entry)
+        else: self._loop.call_soon_threadsafe(self._put, entry)
+
+    def _forget(self, future):
+        with self._lock:
+            job = self._jobs.pop(future, None)
+            if job is not None and job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None: return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._queue = asyncio.PriorityQueue()
+                self._slots = asyncio.Semaphore(self.max_concurrency)
+                self._wakeup = asyncio.Event()
+                loop.create_task(self._dispatch())
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, daemon=True, name="ai-gateway").start()
+            ready.wait()
+            self._loop = loop
+
+    # -------------------------------------
+    # event loop 端
+    # -------------------------------------
+    def _bucket(self, bucket_key):
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = TokenBucket(self.rate_per_min / 60.0, self.burst)
+        return bucket
+
+    def _put(self, entry):
+        self._queue.put_nowait(entry)
+        self._wakeup.set()
+
+    async def _dispatch(self):
+        """先等到有空的併發名額，再把 token 發給當下優先權最高的工作；等 token 時不會有工作佔著名額。"""
+        while True:
+            await self._slots.acquire()
+            job = await self._next()
+            asyncio.get_running_loop().create_task(self._execute(job))
+
+    async def _next(self):
+        while True:
+            entry = await self._queue.get()
+            _, _, attempt, job = entry
+            if attempt != job.attempt or job.running or job.future.done(): continue
+            wait = self._bucket(job.bucket_key).wait_time()
+            if wait > 0:
+                # 沒有 token：放回佇列，等 token 補上或有新工作進來，再重新挑優先權最高的
+                metrics.inc("gateway_throttled")
+                self._queue.put_nowait(entry)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+                continue
+            with self._lock:
+                # 升級優先權的工作會在佇列裡出現兩次：先標記，第二份取出時才不會再通知一次 (RuntimeError)
+                job.started = job.running = True
+                if attempt == 0 and not job.future.set_running_or_notify_cancel(): continue
+            self._bucket(job.bucket_key).take()
+            return job
+
+    async def _execute(self, job):
+        try:
+            await self._attempt(job)
+        finally:
+            self._slots.release()
+
+    async def _attempt(self, job):
+        if job.attempt == 0:
+            metrics.observe("gateway_queue_wait", time.perf_counter() - job.enqueued, priority=job.priority)
+        call = asyncio.get_running_loop().run_in_executor(self._executor, job.fn)
+        done, _ = await asyncio.wait({call}, timeout=job.timeout)
+        if not done:
+            # 逾時只是不再等，同步的 SDK 呼叫停不下來 (SDK 也帶了 timeout，通常很快就結束)；thread 結束前一直佔著名額
+            metrics.inc("gateway_timeouts")
+            if job.attempt < self.retries:
+                # 不同時送出第二份：最多再等一個 timeout，晚到的結果照常處理 (成功就直接用)
+                done, _ = await asyncio.wait({call}, timeout=job.timeout)
+            if not done:
+                job.future.set_exception(TimeoutError(f"AI 呼叫超過 {job.timeout:g} 秒"))
+                await asyncio.wait({call})
+                return
+        exc = call.exception()
+        if exc is None:
+            job.future.set_result(call.result())
+        elif job.attempt >= self.retries or not is_retryable(exc):
+            job.future.set_exception(exc)
+        else:
+            # 重試回到佇列重新排隊：退避期間不佔名額，token 一樣依優先權發
+            metrics.inc("gateway_retries")
+            delay = min(self.backoff_max, self.backoff * 2 ** job.attempt) * (0.5 + random.random() / 2)
+            with self._lock:
+                job.running = False
+                job.attempt += 1
+                self._enqueue(job, delay)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """整個行程共用一個 gateway；參數可用環境變數調整。"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = AIGateway(
+                max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", 4)),
+                rate_per_min=float(os.environ.get("AI_RATE_PER_MIN", 60)),
+                timeout=float(os.environ.get("AI_TIMEOUT", 30)),
+                retries=int(os.environ.get("AI_RETRIES", 2)),
+            )
+        return _gateway
@@ -0,0 +1,21 @@
+"""匯入：Excel 行程表 (欄位 Day / Time / Title / Location / Cost / Note)。"""
+from .deps import get_pandas
+from .model import TripItem, new_item_id
+
+
+def rows_to_trip_data(rows):
+    new_trip_data = {}
+    for row in rows:
+        day = int(row['Day'])
+        if day not in new_trip_data: new_trip_data[day] = []
+        new_trip_data[day].append(TripItem(
+            new_item_id(), str(row['Time']), str(row['Title']),
+            loc=str(row.get('Location','')), cost=int(row.get('Cost',0)), note=str(row.get('Note',''))
+        ))
+    return new_trip_data
+
+
+def parse_excel(uploaded_file):
+    """讀取 Excel 並回傳 trip_data；格式錯誤時直接丟出例外，由呼叫端決定如何顯示。"""
+    df = get_pandas().read_excel(uploaded_file)
+    return rows_to_trip_data(row for _, row in df.iterrows())
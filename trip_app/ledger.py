@@ -0,0 +1,37 @@
+"""記帳：每個行程項目底下的 expenses 與預算彙總。
+
+預算是項目的 cost，實際支出一律由 expenses 加總 (TripItem.actual)，兩者不再互相覆寫。
+收據辨識來的花費會帶 receipt (收據指紋，見 matching)。
+"""
+from datetime import datetime
+
+from .model import Expense
+
+
+def now_ts(now=None):
+    """now：呼叫端的當地時間 (伺服器可能跑在 UTC)；沒給就用伺服器時間。"""
+    return (now or datetime.now()).isoformat(timespec="seconds")
+
+
+def add_expense(item, name, price, ts=None):
+    expense = Expense(name, price, ts or now_ts())
+    item.expenses.append(expense)
+    return expense
+
+
+def add_expenses(item, results, receipt=None, ts=None):
+    """加入收據辨識結果 ([{"name", "price"}])，忽略金額 <= 0 的列；回傳實際加入的筆數。"""
+    ts = ts or now_ts()
+    cnt = 0
+    for res in results:
+        if res.get('price', 0) > 0:
+            item.expenses.append(Expense(res['name'], res['price'], ts, receipt or ""))
+            cnt += 1
+    return cnt
+
+
+def day_totals(items):
+    """回傳 (預算, 支出)。"""
+    all_cost = sum(item.cost for item in items)
+    all_actual = sum(item.actual for item in items)
+    return all_cost, all_actual
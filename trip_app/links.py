@@ -0,0 +1,13 @@
+"""Google Maps 連結。"""
+import urllib.parse
+
+
+def generate_google_nav_link(origin, dest, mode="transit"):
+    if not origin or not dest: return "#"
+    base = "https://www.google.com/maps/dir/?api=1"
+    return f"{base}&origin={urllib.parse.quote(origin)}&destination={urllib.parse.quote(dest)}&travelmode={mode}"
+
+
+def generate_google_search_link(loc):
+    if not loc: return "#"
+    return f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote(loc)}"
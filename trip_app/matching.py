@@ -0,0 +1,142 @@
+"""花費比對：收據 / 明細指紋、全行程重複偵測 (hash index) 與「這張收據屬於哪個行程」的建議。
+
+索引只在 trip_data 被整個換掉時 (Excel 匯入、雲端下載) 才重建，之後每筆新花費都是 O(1) 加入與查詢；
+行程被刪除造成的舊項目在查詢命中時才順便檢查，不做全表掃描。
+"""
+import collections
+import hashlib
+import re
+import unicodedata
+from datetime import date, datetime
+
+from .model import find_item
+
+# 手動記帳時，同名同價在這段時間內再記一次視為重複 (連點 / 重送)
+DUP_WINDOW_SECONDS = 120
+# 同一張收據在這段時間內再掃一次視為重複；隔更久多半是真的又買了一次
+RECEIPT_WINDOW_SECONDS = 6 * 3600
+
+_PUNCT = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_name(name):
+    return _PUNCT.sub("", unicodedata.normalize("NFKC", str(name)).casefold())
+
+
+def line_key(name, price):
+    return normalize_name(name), int(price)
+
+
+def receipt_fingerprint(lines):
+    """lines：收據辨識結果 [{"name", "price"}]；同一張收據不論辨識順序都得到相同指紋。"""
+    parts = sorted(f"{n}|{p}" for n, p in (line_key(x.get('name', ''), x.get('price', 0)) for x in lines))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_ts(ts):
+    """ts 是當地時間；API 送來帶時區的也只取當地時間，才能和 naive 的 now 比較。"""
+    if not ts: return None
+    try:
+        return datetime.fromisoformat(ts).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+class ExpenseIndex:
+    def __init__(self, window=DUP_WINDOW_SECONDS, receipt_window=RECEIPT_WINDOW_SECONDS):
+        self.window = window
+        self.receipt_window = receipt_window
+        self.source = None
+        self._lines = collections.defaultdict(list)   # line_key -> [(ts, day, item_id)]
+        self._receipts = {}                             # receipt fp -> (ts, day, item_id)，只留最後一次
+
+    def ensure(self, trip_data):
+        """trip_data 換了一份新的物件才重建。"""
+        if self.source is trip_data: return
+        self._lines.clear()
+        self._receipts.clear()
+        for day, items in trip_data.items():
+            for item in items:
+                for ex in item.expenses:
+                    self.add(ex, day, item.id)
+        self.source = trip_data
+
+    def add(self, expense, day, item_id):
+        ts = _parse_ts(expense.ts)
+        self._lines[line_key(expense.name, expense.price)].append((ts, day, item_id))
+        if expense.receipt:
+            self._receipts[expense.receipt] = (ts, day, item_id)
+
+    def find_receipt(self, fp, when=None):
+        """receipt_window 內已記錄過同一張收據 → (day, item)，或 None。"""
+        hit = self._receipts.get(fp)
+        if not hit: return None
+        ts, day, item_id = hit
+        item = find_item(self.source, day, item_id)
+        if not (item and any(ex.receipt == fp for ex in item.expenses)):
+            del self._receipts[fp]
+            return None
+        when = when or datetime.now()
+        if ts is None or abs((when - ts).total_seconds()) > self.receipt_window: return None
+        return day, item
+
+    def find_line(self, name, price, when=None):
+        """同名同價、時間在 window 內的既有花費 → (day, item)，或 None。"""
+        key = line_key(name, price)
+        when = when or datetime.now()
+        for ts, day, item_id in reversed(self._lines.get(key, ())):
+            if ts is None or abs((when - ts).total_seconds()) > self.window: continue
+            item = find_item(self.source, day, item_id)
+            if item and any(line_key(ex.name, ex.price) == key for ex in item.expenses):
+                return day, item
+        return None
+
+
+# -------------------------------------
+# 建議所屬行程
+# -------------------------------------
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+def _bigrams(text):
+    s = normalize_name(text)
+    return {s[i:i + 2] for i in range(len(s) - 1)} or ({s} if s else set())
+
+
+def _minutes(hhmm):
+    try:
+        h, m = str(hhmm).split(":")[:2]
+        return int(h) * 60 + int(m)
+    except ValueError:
+        return None
+
+
+def suggest_item(trip_data, start_date, now=None, names=(), place=None):
+    """依現在時間與文字相似度，猜這筆花費屬於哪個行程：回傳 (day, item, score) 或 None。
+
+    時間：當天、且在行程開始之後最接近的項目分數最高 (收據通常在行程開始後拿到)。now 要傳使用者當地時間。
+    文字：品名 / 店名 (place，收據辨識的 store) 與行程標題、地點的 bigram 重疊度。
+    """
+    now = now or datetime.now()
+    if not isinstance(start_date, date): return None
+    day = (now.date() - _as_date(start_date)).days + 1
+    items = trip_data.get(day) or []
+    if not items: return None
+    now_min = now.hour * 60 + now.minute
+    query = set()
+    for text in list(names) + ([place] if place else []):
+        query |= _bigrams(text)
+
+    best = None
+    for item in items:
+        t = _minutes(item.time)
+        if t is None: continue
+        delta = now_min - t
+        score = (1.0 if delta >= 0 else 0.5) / (1 + abs(delta) / 60)
+        if query:
+            target = _bigrams(item.title) | _bigrams(item.loc)
+            if target: score += len(query & target) / len(query | target)
+        if best is None or score > best[2]:
+            best = (day, item, score)
+    return best
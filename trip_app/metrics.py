@@ -0,0 +1,233 @@
+"""效能量測：計時區段 (span)、計數器、OpenMetrics 文字輸出與取樣式 profiler。
+
+只用標準函式庫，全部在記憶體中，整個行程共用一份 (Streamlit 的所有 session 一起統計)。
+"""
+import collections
+import contextlib
+import functools
+import sys
+import threading
+import time
+
+# 延遲分佈的桶 (秒)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "trip_app_"
+
+_lock = threading.Lock()
+_counters = collections.defaultdict(float)   # (name, labels) -> value
+_spans = {}                                  # (name, labels) -> [count, sum, bucket counts...]
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# -------------------------------------
+# 計數器 & 計時
+# -------------------------------------
+def inc(name, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def cache_lookup(cache, hit):
+    inc("cache_hits" if hit else "cache_misses", cache=cache)
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        stat = _spans.get(key)
+        if stat is None:
+            stat = _spans[key] = [0, 0.0] + [0] * len(BUCKETS)
+        stat[0] += 1
+        stat[1] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound: stat[2 + i] += 1
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append((name, dict(labels), seconds))
+
+
+@contextlib.contextmanager
+def span(name, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+def timed(name, **labels):
+    """裝飾器版本的 span；產生器函式會量到整個迭代結束為止。"""
+    def deco(fn):
+        if _is_generator(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                with span(name, **labels):
+                    yield from fn(*args, **kwargs)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def _is_generator(fn):
+    return bool(getattr(fn, "__code__", None) and fn.__code__.co_flags & 0x20)
+
+
+def record_usage(response, fn):
+    """記錄 Gemini 回應中的 token 用量 (usage_metadata 不存在時略過)。"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage: return
+    inc("ai_tokens", getattr(usage, "prompt_token_count", 0) or 0, fn=fn, kind="prompt")
+    inc("ai_tokens", getattr(usage, "candidates_token_count", 0) or 0, fn=fn, kind="output")
+
+
+# -------------------------------------
+# 單次 rerun 的追蹤 (debug 面板用)
+# -------------------------------------
+def start_trace():
+    """開始收集目前執行緒結束的 span，回傳會持續累積的 [(name, labels, seconds), ...]。
+
+    Streamlit 的 rerun 可能在任何地方被 st.rerun() 中斷，所以不用 with：下一次 start_trace 會直接換掉舊的。
+    """
+    _local.trace = spans = []
+    return spans
+
+
+def stop_trace():
+    _local.trace = None
+
+
+# -------------------------------------
+# OpenMetrics 輸出
+# -------------------------------------
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs: return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_openmetrics():
+    with _lock:
+        counters = dict(_counters)
+        spans = {k: list(v) for k, v in _spans.items()}
+    lines = []
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name: lines.append(f"{PREFIX}{name}_total{_fmt_labels(labels)} {value:g}")
+    for name in sorted({k[0] for k in spans}):
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (n, labels), stat in sorted(spans.items()):
+            if n != name: continue
+            for i, bound in enumerate(BUCKETS):
+                lines.append(f"{metric}_bucket{_fmt_labels(labels, [('le', bound)])} {stat[2 + i]}")
+            lines.append(f"{metric}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {stat[0]}")
+            lines.append(f"{metric}_count{_fmt_labels(labels)} {stat[0]}")
+            lines.append(f"{metric}_sum{_fmt_labels(labels)} {stat[1]:.6f}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """給 debug 面板用：{"counters": [(name, labels, value)], "spans": [(name, labels, count, avg_s)]}。"""
+    with _lock:
+        counters = [(n, dict(l), v) for (n, l), v in sorted(_counters.items())]
+        spans = [(n, dict(l), s[0], s[1] / s[0] if s[0] else 0.0) for (n, l), s in sorted(_spans.items())]
+    return {"counters": counters, "spans": spans}
+
+
+_server = None
+
+
+def start_http_server(port, addr="0.0.0.0"):
+    """在背景執行緒提供 GET /metrics (OpenMetrics 文字)；重複呼叫只會啟動一次。"""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_openmetrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _server is not None: return _server
+        _server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-http").start()
+    return _server
+
+
+# -------------------------------------
+# 取樣式 profiler (輸出 flamegraph.pl / speedscope 可讀的 collapsed stacks)
+# -------------------------------------
+class SamplingProfiler:
+    """max_seconds / max_stacks 到了就自動停止，忘了關也不會一直吃 CPU 與記憶體。"""
+
+    def __init__(self, interval=0.005, max_seconds=60, max_stacks=5000):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """每次開始都重新取樣，上一輪 (可能是別的 session 開的) 的結果清掉。"""
+        if self.running: return
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline or len(self.stacks) >= self.max_stacks: break
+            for tid, frame in sys._current_frames().items():
+                if tid == me: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + "\n"
+
+
+profiler = SamplingProfiler()
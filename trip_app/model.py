@@ -0,0 +1,175 @@
+"""行程資料模型：資料型別、預設資料、主題、行程項目與時間軸。不依賴 Streamlit。"""
+import random
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# 🎨 主題配色庫
+THEMES = {
+    "⛩️ 京都緋紅 (預設)": {
+        "bg": "#FDFCF5", "card": "#FFFFFF", "text": "#2B2B2B", "primary": "#8E2F2F", "secondary": "#D6A6A6", "sub": "#666666"
+    },
+    "🌫️ 莫蘭迪·霧藍": {
+        "bg": "#F0F4F8", "card": "#FFFFFF", "text": "#243B53", "primary": "#486581", "secondary": "#BCCCDC", "sub": "#627D98"
+    },
+    "🌿 莫蘭迪·鼠尾草": {
+        "bg": "#F1F5F1", "card": "#FFFFFF", "text": "#2C3E2C", "primary": "#5F7161", "secondary": "#AFC0B0", "sub": "#506050"
+    },
+    "🍂 莫蘭迪·焦糖奶茶": {
+        "bg": "#FAF6F1", "card": "#FFFFFF", "text": "#4A3B32", "primary": "#9C7C64", "secondary": "#E0D0C5", "sub": "#7D6556"
+    }
+}
+DEFAULT_THEME = "⛩️ 京都緋紅 (預設)"
+
+DEFAULT_RATES = {
+    "日本": 0.2150, "韓國": 0.0235, "泰國": 0.9500, "台灣": 1.0000
+}
+
+SHOPPING_COLUMNS = ["對象", "商品名稱", "預算(¥)", "已購買"]
+
+
+# -------------------------------------
+# 資料型別 (__slots__ dataclass：比 dict 省記憶體，欄位固定不會漏 key)
+# -------------------------------------
+@dataclass(slots=True)
+class Expense:
+    name: str
+    price: int
+    ts: str = ""
+    receipt: str = ""   # 收據指紋 (見 matching)；手動記帳為空字串
+
+
+@dataclass(slots=True)
+class TripItem:
+    id: int
+    time: str = "09:00"
+    title: str = "新行程"
+    loc: str = ""
+    cost: int = 0       # 預算；實際支出一律由 expenses 加總 (actual)
+    cat: str = "other"
+    note: str = ""
+    trans_mode: str = "📍 移動"
+    trans_min: int = 30
+    expenses: list = field(default_factory=list)
+
+    @property
+    def actual(self):
+        return sum(x.price for x in self.expenses)
+
+
+@dataclass(slots=True)
+class Wish:
+    id: int
+    title: str
+    loc: str = ""
+    note: str = ""
+
+
+@dataclass(slots=True)
+class Hotel:
+    id: int
+    name: str
+    range: str = ""
+    date: str = ""
+    addr: str = ""
+    link: str = ""
+
+
+@dataclass(slots=True)
+class Flight:
+    date: str = ""
+    code: str = ""
+    dep: str = ""
+    arr: str = ""
+    dep_loc: str = ""
+    arr_loc: str = ""
+
+
+# 時間軸上的一步：直接指向 trip_data 裡的項目，不複製
+Step = namedtuple("Step", "day_num item")
+
+
+# -------------------------------------
+# 預設資料 (每次呼叫都回傳新物件，避免不同 session 共用同一份)
+# -------------------------------------
+def default_trip_data():
+    return {
+        1: [
+            TripItem(101, "10:00", "抵達關西機場", "關西機場", 0, "trans", "入境審查", "🚆 Skyliner", 45),
+            TripItem(102, "13:00", "京都車站 Check-in", "KOKO HOTEL 京都", 0, "stay", "寄放行李", "🚌 巴士", 20),
+            TripItem(103, "15:00", "錦市場", "錦市場", 2000, "food", "吃午餐", "🚶 步行", 15),
+            TripItem(104, "18:00", "鴨川散步", "鴨川", 0, "spot", "夜景", "📍 移動", 30)
+        ],
+        2: [
+            TripItem(201, "09:00", "清水寺", "清水寺", 400, "spot", "清水舞台", "🚶 步行", 20),
+            TripItem(202, "11:00", "三年坂", "三年坂", 1000, "spot", "買伴手禮", "🚶 步行", 15),
+            TripItem(203, "13:00", "八坂神社", "八坂神社", 0, "spot", "祈福", "🚌 巴士", 30)
+        ],
+        3: [], 4: [], 5: []
+    }
+
+
+def default_wishlist():
+    return [
+        Wish(901, "HARBS 千層蛋糕", "大丸京都店", "必吃水果千層"),
+        Wish(902, " % Arabica 咖啡", "嵐山", "網美打卡點")
+    ]
+
+
+def default_checklist():
+    return {
+        "必要證件": {"護照": False, "機票證明": False, "Visit Japan Web": False, "日幣現金": False},
+        "電子產品": {"手機 & 充電線": False, "行動電源": False, "SIM卡 / Wifi機": False, "轉接頭": False},
+        "衣物穿搭": {"換洗衣物": False, "睡衣": False, "好走的鞋子": False, "外套": False},
+        "生活用品": {"牙刷牙膏": False, "常備藥": False, "塑膠袋": False, "折疊傘": False}
+    }
+
+
+def default_flight_info():
+    return {
+        "outbound": Flight("1/17", "JX821", "10:00", "13:30", "桃機 T1", "關西機場"),
+        "inbound": Flight("1/22", "JX822", "15:00", "17:10", "關西機場", "桃機 T1")
+    }
+
+
+def default_hotel_info():
+    return [
+        Hotel(1, "KOKO HOTEL 京都", "D1-D3 (3泊)", "1/17 - 1/19", "京都府京都市..."),
+        Hotel(2, "相鐵 FRESA INN 大阪", "D4-D5 (2泊)", "1/20 - 1/21", "大阪府大阪市...")
+    ]
+
+
+def is_valid_checklist(checklist):
+    return isinstance(checklist, dict) and all(isinstance(v, dict) for v in checklist.values())
+
+
+# -------------------------------------
+# 行程項目
+# -------------------------------------
+def new_item_id():
+    return int(time.time() * 1000) + random.randint(0, 1000)
+
+
+def new_item(title="新行程", time_str="09:00", loc="", note="", cost=0, cat="other", item_id=None):
+    return TripItem(item_id if item_id is not None else int(datetime.now().timestamp()),
+                    time_str, title, loc, cost, cat, note)
+
+
+def ensure_days(trip_data, days_count):
+    for d in range(1, days_count + 1):
+        if d not in trip_data: trip_data[d] = []
+    return trip_data
+
+
+def build_timeline(trip_data):
+    """把所有天的行程依時間排成一條時間軸：[Step(day_num, item), ...]，item 就是 trip_data 裡的物件。"""
+    return [Step(d, item) for d in sorted(trip_data.keys())
+            for item in sorted(trip_data[d], key=lambda x: x.time)]
+
+
+def find_item(trip_data, day_num, item_id):
+    for item in trip_data.get(day_num, []):
+        if item.id == item_id:
+            return item
+    return None
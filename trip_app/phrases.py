@@ -0,0 +1,187 @@
+"""會話包：旅遊會話與緊急求助句，依國家 / 語言各一個 JSON 檔，用到才載入。
+
+內建的放在 trip_app/packs/；其他國家可用 AI 產生，存到 PHRASE_PACK_DIR (預設 ~/.cache/trip_app/packs)，
+同一台機器上的所有使用者與 session 共用，同一個國家只會產生一次。部署成多個容器 (自動擴展) 時每個容器
+各有一份，要全部共用得把 PHRASE_PACK_DIR 指到共用的磁碟。語音 (gTTS，選用) 事先產生成 mp3 存在同一個目錄，
+頁面上播放時仍是從伺服器串流；要在沒網路的地方用，下載 bundle() 的 zip (含可直接開啟的 phrases.html 與 mp3)。
+檔案帶 version，格式升級後舊的 AI 快取會被忽略並重新產生。
+"""
+import hashlib
+import html
+import io
+import json
+import os
+import threading
+import zipfile
+from dataclasses import asdict, dataclass, field
+
+from . import ai, metrics
+from .deps import TTS_AVAILABLE, get_tts_cls
+
+PACK_VERSION = 1
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "packs")
+CACHE_DIR = os.environ.get("PHRASE_PACK_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "trip_app", "packs")
+
+BUNDLED = {"日本": "ja.json", "韓國": "ko.json", "泰國": "th.json"}
+
+# 常見目的地的語言 (gTTS 代碼)；不在表內的由 AI 判斷
+COUNTRY_LANGS = {
+    "日本": "ja", "韓國": "ko", "泰國": "th", "越南": "vi", "印尼": "id", "馬來西亞": "ms", "菲律賓": "tl",
+    "美國": "en", "英國": "en", "澳洲": "en", "法國": "fr", "德國": "de", "義大利": "it", "西班牙": "es",
+    "台灣": "zh-TW", "香港": "zh-TW", "中國": "zh-CN",
+}
+
+SOS_CATEGORY = "🆘"
+
+
+@dataclass(slots=True)
+class PhrasePack:
+    country: str
+    lang: str
+    phrases: dict                              # 分類 -> [(中文, 當地文字, 拼音), ...]
+    sos: list = field(default_factory=list)   # [(中文, 當地文字, 拼音), ...]
+    version: int = PACK_VERSION
+    source: str = "bundled"
+
+    def texts(self):
+        """所有需要語音的當地文字 (不重複)。"""
+        rows = [r for rows in self.phrases.values() for r in rows] + self.sos
+        return list(dict.fromkeys(r[1] for r in rows))
+
+
+def _row(r):
+    return (str(r[0]), str(r[1]), str(r[2]) if len(r) > 2 else "")
+
+
+def pack_from_dict(d):
+    return PhrasePack(d['country'], d['lang'], {k: [_row(r) for r in rows] for k, rows in d['phrases'].items()},
+                      [_row(r) for r in d.get('sos', [])], d.get('version', 1), d.get('source', "bundled"))
+
+
+# -------------------------------------
+# 載入 / 快取 (process 內共用)
+# -------------------------------------
+_packs = {}
+_lock = threading.Lock()
+_country_locks = {}
+
+
+def _cache_path(country):
+    return os.path.join(CACHE_DIR, f"{hashlib.sha1(country.encode('utf-8')).hexdigest()[:12]}.json")
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            pack = pack_from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return None
+    return pack if pack.version == PACK_VERSION else None
+
+
+def _write(path, pack):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(asdict(pack), f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def get_pack(country):
+    """內建或先前產生過的會話包；都沒有時回傳 None。"""
+    pack = _packs.get(country)
+    if pack is not None: return pack
+    pack = (_read(os.path.join(BUNDLED_DIR, BUNDLED[country])) if country in BUNDLED else None) or _read(_cache_path(country))
+    metrics.cache_lookup("phrase_pack", pack is not None)
+    if pack is not None: _packs[country] = pack
+    return pack
+
+
+def generate_pack(country, api_key):
+    """用 AI 產生並永久快取；多人同時要求同一個國家也只會送一次。失敗回傳 None。"""
+    with _lock:
+        country_lock = _country_locks.setdefault(country, threading.Lock())
+    with country_lock:
+        pack = get_pack(country)
+        if pack is not None: return pack
+        res = ai.generate_phrase_pack(country, api_key, COUNTRY_LANGS.get(country))
+        if not res: return None
+        phrases, sos = {}, []
+        for r in res['rows']:
+            row = (r['zh'], r['local'], r.get('roman', ""))
+            if r.get('sos') or r['category'] == SOS_CATEGORY: sos.append(row)
+            else: phrases.setdefault(r['category'], []).append(row)
+        pack = PhrasePack(country, res['lang'], phrases, sos, source="ai")
+        try:
+            _write(_cache_path(country), pack)
+        except OSError as e:
+            print(f"Phrase Pack Save Error: {e}")
+        _packs[country] = pack
+        return pack
+
+
+# -------------------------------------
+# 語音 (選用：需要 gTTS，產生時需要網路) 與離線包
+# -------------------------------------
+_audio = {}
+
+
+def _audio_path(pack, text):
+    return os.path.join(CACHE_DIR, "audio", pack.lang, f"{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}.mp3")
+
+
+def get_audio(pack, text):
+    """已產生的 mp3 bytes，沒有就回傳 None。"""
+    path = _audio_path(pack, text)
+    data = _audio.get(path)
+    if data is None and os.path.exists(path):
+        with open(path, "rb") as f:
+            data = _audio[path] = f.read()
+    return data
+
+
+def missing_audio(pack):
+    return [t for t in pack.texts() if not os.path.exists(_audio_path(pack, t))]
+
+
+def build_audio(pack):
+    """把還沒有語音的句子都產生好；回傳成功的數量。"""
+    if not TTS_AVAILABLE: return 0
+    cnt = 0
+    for text in missing_audio(pack):
+        path = _audio_path(pack, text)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with metrics.span("tts_call", lang=pack.lang):
+                get_tts_cls()(text, lang=pack.lang).save(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            cnt += 1
+        except Exception as e:
+            metrics.inc("tts_errors", lang=pack.lang)
+            print(f"TTS Error: {e}")
+    return cnt
+
+
+def bundle(pack):
+    """離線包 (zip bytes)：pack.json、手機上直接開啟的 phrases.html，以及已產生的 mp3。"""
+    buf = io.BytesIO()
+    body = []
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("pack.json", json.dumps(asdict(pack), ensure_ascii=False))
+        written = set()
+        for category, rows in [*pack.phrases.items(), (SOS_CATEGORY, pack.sos)]:
+            if not rows: continue
+            body.append(f"<h2>{html.escape(category)}</h2>")
+            for zh, local, roman in rows:
+                clip = get_audio(pack, local)
+                player = ""
+                if clip:
+                    name = f"audio/{os.path.basename(_audio_path(pack, local))}"
+                    if name not in written:
+                        zf.writestr(name, clip, compress_type=zipfile.ZIP_STORED)   # mp3 本身已壓縮
+                        written.add(name)
+                    player = f'<br><audio controls preload="none" src="{name}"></audio>'
+                body.append(f"<p><b>{html.escape(zh)}</b><br><big>{html.escape(local)}</big> <small>{html.escape(roman)}</small>{player}</p>")
+        zf.writestr("phrases.html", f'<!doctype html><meta charset="utf-8"><meta name="viewport" content="width=device-width">'
+                                    f"<title>{html.escape(pack.country)}</title><h1>{html.escape(pack.country)}</h1>{''.join(body)}")
+    return buf.getvalue()
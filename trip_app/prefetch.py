@@ -0,0 +1,87 @@
+"""AI 建議預先載入：完成一站後，在背景先產生接下來幾站 (與隔天整天) 的建議。
+
+結果放進呼叫端的建議快取 (key 為 ai.advice_cache_key)，在漫遊網路不穩時 Live 卡片也能立刻顯示。
+行程內容一改就取消尚未開始的預載 (已經在跑的照樣收下結果)；token 預算用完就停止。
+"""
+import hashlib
+import os
+
+from . import ai, gateway, metrics
+
+
+def itinerary_fingerprint(trip_data):
+    h = hashlib.sha1()
+    for d in sorted(trip_data):
+        for item in trip_data[d]:
+            h.update(f"{d}|{item.id}|{item.time}|{item.title}|{item.loc}|{item.note}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class AdvicePrefetcher:
+    def __init__(self, api_key, country, lookahead=None, token_budget=None):
+        self.api_key = api_key
+        self.country = country
+        self.lookahead = lookahead if lookahead is not None else int(os.environ.get("AI_PREFETCH_LOOKAHEAD", 3))
+        self.token_budget = token_budget if token_budget is not None else int(os.environ.get("AI_PREFETCH_TOKEN_BUDGET", 20000))
+        self.tokens_used = 0
+        self.pending = {}   # cache key -> Future
+        self.fingerprint = None
+
+    def sync(self, trip_data, country=None):
+        """每次 rerun 呼叫：行程或地區變了就取消還在排隊的預載。"""
+        fp = itinerary_fingerprint(trip_data)
+        changed = (self.fingerprint is not None and fp != self.fingerprint) or (country and country != self.country)
+        if changed: self.cancel_all()
+        self.fingerprint = fp
+        if country: self.country = country
+
+    def cancel_all(self):
+        """取消還在排隊的預載；已經在跑的取消不了 (token 也已經花了)，留著讓 collect() 收進快取，
+        快取 key 依內容計算，行程改過也不會拿錯。"""
+        gw = gateway.get_gateway()
+        for key, future in list(self.pending.items()):
+            if gw.cancel(future):
+                metrics.inc("prefetch_cancelled")
+                del self.pending[key]
+
+    def collect(self, cache):
+        """把已完成的預載結果搬進快取；失敗的直接丟掉 (之後使用者手動產生)。"""
+        for key, future in list(self.pending.items()):
+            if not future.done(): continue
+            del self.pending[key]
+            if future.cancelled() or future.exception() is not None: continue
+            text = future.result()
+            if text:
+                cache[key] = text
+                metrics.inc("prefetch_completed")
+
+    def targets(self, steps, index):
+        """接下來 lookahead 站；若目前這站是當天最後一站，再加上隔天整天。"""
+        if index >= len(steps): return []
+        chosen = steps[index:index + self.lookahead]
+        day = steps[index].day_num
+        is_last_of_day = index + 1 >= len(steps) or steps[index + 1].day_num != day
+        if is_last_of_day:
+            next_day = steps[index + 1].day_num if index + 1 < len(steps) else None
+            chosen = chosen + [s for s in steps[index + 1:] if s.day_num == next_day]
+        return chosen
+
+    def schedule(self, steps, index, cache):
+        """使用者前往 steps[index] 時呼叫；回傳這次新排入的數量。"""
+        scheduled = 0
+        seen = set()
+        for _, item in self.targets(steps, index):
+            key = ai.advice_cache_key(item, self.country)
+            if key in cache or key in self.pending or key in seen: continue
+            seen.add(key)
+            estimate = ai.estimate_advice_tokens(item, self.country)
+            if self.tokens_used + estimate > self.token_budget:
+                metrics.inc("prefetch_skipped", reason="budget")
+                break
+            future = ai.submit_step_advice(item, self.country, self.api_key, priority=gateway.BACKGROUND)
+            if future is None: break
+            self.tokens_used += estimate
+            self.pending[key] = future
+            scheduled += 1
+        metrics.inc("prefetch_scheduled", scheduled)
+        return scheduled
@@ -0,0 +1,188 @@
+"""全域搜尋：記憶體內的倒排索引，中日韓文字用 bigram 切詞 (錦市場、八坂神社 沒有空白分隔)，並支援模糊比對。
+
+索引以 (kind, key) 為文件 id；sync() 只重新切詞內容有變的文件，所以每次 rerun 呼叫的成本與「變動量」成正比。
+"""
+import collections
+import difflib
+import re
+import unicodedata
+
+KINDS = {
+    "trip": "📅 行程",
+    "wish": "✨ 願望",
+    "check": "🎒 清單",
+    "hotel": "🏨 住宿",
+    "shop": "🛍️ 購物",
+}
+
+# 中日韓字串與其他文字分開切：「SIM卡」、「JR京都駅」要拆成 sim + 卡、jr + 京都駅
+_RUN = re.compile(r'[⺀-鿿가-힯豈-﫿]+|[^\W_⺀-鿿가-힯豈-﫿]+', re.UNICODE)
+_CJK = re.compile(r'[⺀-鿿가-힯豈-﫿]')
+
+FUZZY_WEIGHT = 0.6
+FUZZY_RATIO = 0.75
+# 查詢詞命中比例的門檻；模糊命中至少算這麼多，否則單字查詢打錯一個字母 (wify) 算出 0.45 會被丟掉
+MIN_SCORE = 0.5
+
+
+def _norm(text):
+    return unicodedata.normalize("NFKC", str(text)).casefold()
+
+
+def tokenize(text, query=False):
+    """中日韓連續字串切成 bigram (文件另外加上單字，讓一個字的查詢也找得到)；其他文字以單字為單位。"""
+    tokens = []
+    for run in _RUN.findall(_norm(text)):
+        if _CJK.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+                continue
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if not query: tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = collections.defaultdict(set)   # token -> {doc_id}
+        self._doc_tokens = {}                           # doc_id -> set(token)
+        self._docs = {}                                 # doc_id -> (text, meta)
+        self._keys = collections.defaultdict(set)       # kind -> {key}
+        self._grams = collections.defaultdict(set)      # 模糊比對用：(位置, 字元) 或 bigram -> {token}
+        self._fuzzy_cache = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -------------------------------------
+    # 更新
+    # -------------------------------------
+    def upsert(self, doc_id, text, meta=None):
+        old = self._docs.get(doc_id)
+        if old is not None and old[0] == text:
+            self._docs[doc_id] = (text, meta)
+            return False
+        new_tokens = set(tokenize(text))
+        old_tokens = self._doc_tokens.get(doc_id, set())
+        for tok in old_tokens - new_tokens: self._unpost(tok, doc_id)
+        for tok in new_tokens - old_tokens: self._post(tok, doc_id)
+        self._doc_tokens[doc_id] = new_tokens
+        self._docs[doc_id] = (text, meta)
+        self._keys[doc_id[0]].add(doc_id[1])
+        return True
+
+    def remove(self, doc_id):
+        for tok in self._doc_tokens.pop(doc_id, ()): self._unpost(tok, doc_id)
+        self._docs.pop(doc_id, None)
+        self._keys[doc_id[0]].discard(doc_id[1])
+
+    def sync(self, kind, docs):
+        """把某一類文件同步成 docs ({key: (text, meta)})；回傳實際變動的文件數。"""
+        changed = 0
+        for key, (text, meta) in docs.items():
+            changed += self.upsert((kind, key), text, meta)
+        for key in self._keys[kind] - docs.keys():
+            self.remove((kind, key))
+            changed += 1
+        return changed
+
+    def _post(self, tok, doc_id):
+        postings = self._postings[tok]
+        if not postings:
+            for g in self._token_grams(tok): self._grams[g].add(tok)
+            self._fuzzy_cache.clear()
+        postings.add(doc_id)
+
+    def _unpost(self, tok, doc_id):
+        postings = self._postings.get(tok)
+        if postings is None: return
+        postings.discard(doc_id)
+        if not postings:
+            del self._postings[tok]
+            for g in self._token_grams(tok):
+                self._grams[g].discard(tok)
+                if not self._grams[g]: del self._grams[g]
+            self._fuzzy_cache.clear()
+
+    @staticmethod
+    def _token_grams(tok):
+        if len(tok) <= 2: return [(i, ch) for i, ch in enumerate(tok)]
+        return [tok[i:i + 2] for i in range(len(tok) - 1)]
+
+    # -------------------------------------
+    # 查詢
+    # -------------------------------------
+    def _fuzzy(self, tok):
+        """詞彙表中與 tok 相近的詞 → 權重。"""
+        hit = self._fuzzy_cache.get(tok)
+        if hit is not None: return hit
+        candidates = set()
+        for g in self._token_grams(tok): candidates |= self._grams.get(g, set())
+        result = {}
+        for cand in candidates:
+            if len(tok) <= 2:
+                # 兩個字的 bigram：同長度、只差一個字
+                if len(cand) == len(tok) and sum(a != b for a, b in zip(cand, tok)) <= 1:
+                    result[cand] = FUZZY_WEIGHT
+            else:
+                ratio = difflib.SequenceMatcher(None, tok, cand).ratio()
+                if ratio >= FUZZY_RATIO: result[cand] = max(FUZZY_WEIGHT * ratio, MIN_SCORE)
+        self._fuzzy_cache[tok] = result
+        return result
+
+    def query(self, q, limit=20, min_score=MIN_SCORE):
+        """回傳 [(score, doc_id, text, meta), ...]，score 為查詢詞命中的比例 (模糊命中打折)。"""
+        q_tokens = list(dict.fromkeys(tokenize(q, query=True)))
+        if not q_tokens: return []
+        scores = collections.defaultdict(float)
+        for tok in q_tokens:
+            matched = {}
+            for doc_id in self._postings.get(tok, ()): matched[doc_id] = 1.0
+            if tok not in self._postings:
+                for cand, w in self._fuzzy(tok).items():
+                    for doc_id in self._postings.get(cand, ()):
+                        if w > matched.get(doc_id, 0): matched[doc_id] = w
+            for doc_id, w in matched.items(): scores[doc_id] += w
+        n = len(q_tokens)
+        ranked = sorted(((s / n, d) for d, s in scores.items() if s / n >= min_score), key=lambda x: (-x[0], str(x[1])))
+        return [(score, d, *self._docs[d]) for score, d in ranked[:limit]]
+
+
+# -------------------------------------
+# 從 session 資料建立文件
+# -------------------------------------
+def trip_docs(trip_data):
+    return {item.id: (f"{item.title} {item.loc} {item.note}", {"day": d, "title": item.title, "sub": item.loc})
+            for d, items in trip_data.items() for item in items}
+
+
+def wish_docs(wishlist):
+    return {w.id: (f"{w.title} {w.loc} {w.note}", {"title": w.title, "sub": w.loc})
+            for w in wishlist}
+
+
+def checklist_docs(checklist):
+    return {(cat, name): (f"{name} {cat}", {"title": name, "sub": cat})
+            for cat, items in checklist.items() for name in items}
+
+
+def hotel_docs(hotel_info):
+    return {i: (f"{h.name} {h.addr} {h.range}", {"title": h.name, "sub": h.addr})
+            for i, h in enumerate(hotel_info)}
+
+
+def shopping_docs(rows):
+    """rows：購物清單的每一列 (dict)。"""
+    docs = {}
+    for i, row in enumerate(rows):
+        values = [str(v) for v in row.values() if v is not None and str(v) not in ("", "nan", "None")]
+        if values: docs[i] = (" ".join(values), {"title": str(row.get("商品名稱") or values[0]), "sub": str(row.get("對象") or "")})
+    return docs
+
+
+def sync_all(index, trip_data, wishlist, checklist, hotel_info, shopping_rows):
+    return (index.sync("trip", trip_docs(trip_data)) + index.sync("wish", wish_docs(wishlist))
+            + index.sync("check", checklist_docs(checklist)) + index.sync("hotel", hotel_docs(hotel_info))
+            + index.sync("shop", shopping_docs(shopping_rows)))
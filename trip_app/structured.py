@@ -0,0 +1,162 @@
+"""結構化 AI 輸出：JSON schema 模式、型別驗證、只重問失敗的欄位，以及精簡的 prompt 模板。
+
+模型以 response_mime_type="application/json" + response_schema 回覆，不再靠字串取代與正規表示式
+從自由文字裡挖 JSON；驗證失敗時只針對缺少或格式錯誤的欄位 / 品項再問一次。
+"""
+import json
+import re
+
+
+def estimate_tokens(text):
+    """粗估 token 數：中日韓文字約 1 字 1 token，其他約 4 字元 1 token。"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+# -------------------------------------
+# Schema
+# -------------------------------------
+class Field:
+    __slots__ = ("name", "type", "required", "description")
+
+    def __init__(self, name, type, required=False, description=""):
+        self.name = name
+        self.type = type
+        self.required = required
+        self.description = description
+
+
+class Schema:
+    __slots__ = ("name", "fields", "many")
+
+    def __init__(self, name, fields, many=False):
+        self.name = name
+        self.fields = fields
+        self.many = many
+
+    def subset(self, names, many=None):
+        return Schema(self.name, [f for f in self.fields if f.name in names], self.many if many is None else many)
+
+    def to_response_schema(self):
+        """轉成 Gemini response_schema (OpenAPI 子集)。"""
+        obj = {
+            "type": "object",
+            "properties": {f.name: {"type": _TYPE_NAMES[f.type], **({"description": f.description} if f.description else {})}
+                           for f in self.fields},
+            "required": [f.name for f in self.fields if f.required],
+        }
+        return {"type": "array", "items": obj} if self.many else obj
+
+    def generation_config(self):
+        return {"response_mime_type": "application/json", "response_schema": self.to_response_schema()}
+
+
+_TYPE_NAMES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+WISH = Schema("wish", [
+    Field("title", str, required=True),
+    Field("loc", str),
+    Field("note", str),
+])
+
+RECEIPT_ITEMS = Schema("receipt_items", [
+    Field("name", str, required=True),
+    Field("price", int, required=True),
+    Field("store", str, description="店名 / 分店，每列相同"),
+], many=True)
+
+PHRASES = Schema("phrases", [
+    Field("category", str, required=True),
+    Field("zh", str, required=True),
+    Field("local", str, required=True),
+    Field("roman", str),
+    Field("sos", bool),
+], many=True)
+
+LANG = Schema("lang", [
+    Field("lang", str, required=True, description="ISO 639-1"),
+])
+
+
+# -------------------------------------
+# 精簡 prompt (TOKENS 為模板本身的估計 token 數；benchmarks/hotpaths.py 會記下來並與舊結果比較)
+# -------------------------------------
+WISH_PROMPT = "從文字擷取一個旅遊景點或餐廳：title=名稱，loc=地址或區域(無則空字串)，note=20字內摘要。\n文字：{text}"
+WISH_REPAIR_PROMPT = "從文字只擷取這些欄位：{fields}。\n文字：{text}"
+RECEIPT_PROMPT = "列出收據上每個商品的 name 與 price(整數)，不含小計、稅金、合計；store=收據上的店名(每列相同)。"
+RECEIPT_REPAIR_PROMPT = "只回傳收據上這些商品的 name 與 price(整數)：{names}"
+PHRASES_PROMPT = ("給去{country}的台灣旅客的實用會話：👋 招呼、🍜 點餐、🚆 交通、🛍️ 購物 各 4 句，category 用這些分類名；"
+                  "再加 3 句緊急求助 (迷路、過敏、送醫)，sos=true、category=🆘。zh=中文，local=當地文字，roman=拉丁拼音(當地文字非拉丁字母時)。")
+LANG_PROMPT = "{country}最通用語言的 ISO 639-1 代碼。"
+
+TOKENS = {name: estimate_tokens(tpl) for name, tpl in {
+    "wish": WISH_PROMPT, "wish_repair": WISH_REPAIR_PROMPT,
+    "receipt": RECEIPT_PROMPT, "receipt_repair": RECEIPT_REPAIR_PROMPT,
+    "phrases": PHRASES_PROMPT, "lang": LANG_PROMPT,
+}.items()}
+
+
+# -------------------------------------
+# 解析 & 驗證
+# -------------------------------------
+def loads(text):
+    """JSON 模式下直接 json.loads；舊模型若仍包了 ``` 或前後文字，再退回擷取第一個 JSON 區塊。失敗回傳 None。"""
+    if not text: return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    match = re.search(r'(\[.*\]|\{.*\})', text, re.DOTALL)
+    if not match: return None
+    try:
+        return json.loads(match.group(0))
+    except ValueError:
+        return None
+
+
+def _coerce(value, typ):
+    if value is None: raise ValueError("missing")
+    if typ is int:
+        if isinstance(value, bool): raise ValueError("bool")
+        if isinstance(value, (int, float)): return int(value)
+        digits = re.sub(r'[^\d.\-]', '', str(value))
+        return int(float(digits))
+    if typ is float: return float(value)
+    if typ is bool:
+        if isinstance(value, bool): return value
+        if str(value).strip().lower() in ("true", "1", "yes"): return True
+        if str(value).strip().lower() in ("false", "0", "no"): return False
+        raise ValueError("not a bool")
+    if typ is str:
+        if isinstance(value, (dict, list)): raise ValueError("not a string")
+        return str(value).strip()
+    return typ(value)
+
+
+def validate_object(obj, schema):
+    """回傳 (乾淨的 dict, 失敗欄位名稱 list)。非必填欄位缺少時補預設值，不算失敗。"""
+    if not isinstance(obj, dict): return {}, [f.name for f in schema.fields]
+    clean, bad = {}, []
+    for f in schema.fields:
+        raw = obj.get(f.name)
+        if raw is None or raw == "":
+            if f.required: bad.append(f.name)
+            else: clean[f.name] = f.type()
+            continue
+        try:
+            clean[f.name] = _coerce(raw, f.type)
+        except (TypeError, ValueError):
+            bad.append(f.name)
+    return clean, bad
+
+
+def validate_list(data, schema):
+    """回傳 (合格的 list, 不合格的原始項目 list)；data 不是 list 時回傳 (None, [])。"""
+    if isinstance(data, dict): data = [data]
+    if not isinstance(data, list): return None, []
+    good, bad = [], []
+    for obj in data:
+        clean, failed = validate_object(obj, schema)
+        if failed: bad.append(obj)
+        else: good.append(clean)
+    return good, bad
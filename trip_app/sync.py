@@ -0,0 +1,55 @@
+"""雲端同步 (Google Sheets TripPlanDB 的 A1 儲存整份 JSON)。"""
+from . import codec, metrics
+from .deps import CLOUD_AVAILABLE, get_credentials_cls, get_gspread
+
+SHEET_NAME = "TripPlanDB"
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+
+@metrics.timed("sheets_call", op="connect")
+def get_cloud_connection(service_account=None, keyfile='secrets.json'):
+    if not CLOUD_AVAILABLE: return None
+    try:
+        if service_account:
+            creds = get_credentials_cls().from_json_keyfile_dict(service_account, SCOPE)
+        else:
+            creds = get_credentials_cls().from_json_keyfile_name(keyfile, SCOPE)
+        client = get_gspread().authorize(creds)
+        return client
+    except Exception: return None
+
+
+def save_to_cloud(json_str, service_account=None):
+    client = get_cloud_connection(service_account)
+    if client:
+        try:
+            with metrics.span("sheets_call", op="save"):
+                sheet = client.open(SHEET_NAME).sheet1
+                sheet.update_cell(1, 1, json_str)
+            return True, "儲存成功！"
+        except Exception as e:
+            metrics.inc("sheets_errors", op="save")
+            return False, f"寫入失敗: {e}"
+    return False, "連線失敗 (請檢查 secrets 設定)"
+
+
+def load_from_cloud(service_account=None):
+    client = get_cloud_connection(service_account)
+    if client:
+        try:
+            with metrics.span("sheets_call", op="load"):
+                sheet = client.open(SHEET_NAME).sheet1
+                return sheet.cell(1, 1).value
+        except Exception:
+            metrics.inc("sheets_errors", op="load")
+            return None
+    return None
+
+
+def dump_state(trip_data, wishlist, checklist, hotel_info=None, flight_info=None):
+    return codec.dumps(codec.encode(trip_data, wishlist, checklist, hotel_info, flight_info))
+
+
+def load_state(raw):
+    """解析雲端 JSON；舊格式 (v1 dict) 會遷移成目前的資料型別。"""
+    return codec.decode(codec.loads(raw))